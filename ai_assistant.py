@@ -1,41 +1,365 @@
 import os
 import json
+import asyncio
 import logging
-import google.generativeai as genai
-from google.genai import types
-from pydantic import BaseModel
-from dotenv import load_dotenv
+import time
+import functools
+from retrieval import ChunkIndex, estimate_tokens, split_into_chunks
+from llm_cache import ResponseCache, make_cache_key
+from llm_backends import BackendTimeout, LLMBackend, create_backend
+from json_stream import JsonArrayParser
+from conversation import ConversationMemory
+from concurrency import BackgroundLoop, TokenBucket, backoff_delay, is_retryable
+from env import load_env
+from metrics import get_metrics
 
-load_dotenv()
+QUIZ_QUESTION_COUNT = 3
+# How long past the backend's own timeout to keep waiting before giving up on a call
+TIMEOUT_GRACE_SECONDS = 5.0
+
+def _is_json(text):
+    """Return True if text parses as JSON"""
+    try:
+        json.loads(text)
+        return True
+    except json.JSONDecodeError:
+        return False
+
+def _describe_error(e):
+    """Error text for the user; some exceptions (e.g. a bare TimeoutError) have an empty message"""
+    if isinstance(e, TimeoutError) and not str(e):
+        return "The model did not respond in time"
+    return str(e) or type(e).__name__
+
+def _set_answered(budget_info, answered):
+    """Record in the caller's ``budget_info`` whether a question got a real answer"""
+    if budget_info is not None:
+        budget_info["answered"] = answered
+
+def _text_field(value, default):
+    """``value`` stripped if it is a non-empty string, otherwise ``default``"""
+    if isinstance(value, str) and value.strip():
+        return value.strip()
+    return default
+
+def _quiz_question(raw):
+    """Decode one element of a quiz array; None if it is malformed or lacks a question or answer"""
+    try:
+        item = json.loads(raw)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(item, dict):
+        return None
+    if not all(isinstance(item.get(field), str) and item[field].strip() for field in ("question", "answer")):
+        return None
+    return item
+
+def _parse_quiz(response_text):
+    """Return the well-formed questions of a quiz response, dropping any malformed ones"""
+    parser = JsonArrayParser()
+    raw_items = parser.feed(response_text or "") + parser.close()
+    questions = [question for question in map(_quiz_question, raw_items) if question is not None]
+    if len(questions) < len(raw_items):
+        logging.error(f"Dropped {len(raw_items) - len(questions)} malformed quiz question(s)")
+    return questions
 
 class AIAssistant:
-    """Handles AI-powered document analysis and interaction"""
+    """Handles AI-powered document analysis and interaction.
+
+    Model calls run on a private event loop thread. Every public method has an
+    ``a``-prefixed coroutine version (``aanswer_question`` etc.); the plain methods
+    are blocking wrappers around them. All calls share one concurrency limit and one
+    token-bucket rate limiter, and retryable errors (429s, timeouts, 5xx) are retried
+    with jittered exponential backoff before being reported.
+    """
     
-    def __init__(self):
+    def __init__(self, backend: LLMBackend = None, context_token_budget=4000, context_top_k=8,
+                 cache: ResponseCache = None, map_reduce_threshold_tokens=30000,
+                 summary_chunk_tokens=8000, summary_workers=4, max_concurrency=4,
+                 requests_per_minute=None, max_retries=4, call_timeout=60.0):
+        # Limits for the excerpts sent with each question when a chunk index is available
+        self.context_token_budget = context_token_budget
+        self.context_top_k = context_top_k
+        # Documents longer than the threshold are summarized chunk by chunk, then combined
+        self.map_reduce_threshold_tokens = map_reduce_threshold_tokens
+        self.summary_chunk_tokens = summary_chunk_tokens
+        self.summary_workers = summary_workers
+        load_env()
+        # Gemini by default; LLM_BACKEND=fake runs fully offline
+        self.backend = backend or create_backend()
+        self.model_name = self.backend.model_name
+
+        if cache is None:
+            cache = ResponseCache(
+                path=os.getenv("LLM_CACHE_PATH", os.path.join(".cache", "llm_responses.sqlite")),
+                ttl_seconds=int(os.getenv("LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600)),
+                max_disk_bytes=int(os.getenv("LLM_CACHE_MAX_BYTES", 100 * 1024 * 1024)),
+            )
+        self.cache = cache
+
+        # Request shaping: in-flight cap, quota, retries and per-call timeout
+        requests_per_minute = requests_per_minute or float(os.getenv("LLM_REQUESTS_PER_MINUTE", 60))
+        self.max_retries = max_retries
+        self.call_timeout = call_timeout
+        self._loop = BackgroundLoop()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._rate_limiter = TokenBucket(requests_per_minute / 60.0, capacity=max_concurrency)
+
+    async def _call_backend(self, method, prompt, call_info=None):
+        """Run a blocking backend call under the concurrency cap, rate limit, timeout and retry policy.
+
+        The timeout is passed to the backend so the request itself gives up; waiting
+        stops a little later as a backstop. A concurrency slot is held until the
+        backend call has really finished, so calls abandoned after a timeout still
+        count against the cap. ``call_info["attempts"]``, if given, is set to the
+        number of attempts made.
+        """
+        attempt = 0
+        while True:
+            if call_info is not None:
+                call_info["attempts"] = attempt + 1
+            try:
+                await self._acquire_slot()
+                call = asyncio.get_running_loop().run_in_executor(
+                    None, functools.partial(method, prompt, timeout=self.call_timeout)
+                )
+                call.add_done_callback(self._release_slot)
+                try:
+                    # shield: giving up on the wait must not mark the still-running call as finished
+                    return await asyncio.wait_for(asyncio.shield(call), timeout=self.call_timeout + TIMEOUT_GRACE_SECONDS)
+                except asyncio.TimeoutError:
+                    raise BackendTimeout(self.call_timeout) from None
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                delay = backoff_delay(attempt)
+                logging.warning(f"Retrying model call after {type(e).__name__} (attempt {attempt + 1}, {delay:.2f}s)")
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    def _release_slot(self, call):
+        self._semaphore.release()
+        if not call.cancelled():
+            # Retrieve the result of abandoned calls so their errors aren't reported as unhandled
+            call.exception()
+
+    async def _agenerate(self, prompt, json_mode=False, validate=None, operation="generate"):
+        """Call the model, serving identical requests from the response cache.
+
+        Responses are only cached when non-empty and, if given, accepted by ``validate``.
+        Every call is recorded in the metrics registry under ``operation``.
+        """
+        metrics = get_metrics()
+        started = time.perf_counter()
+        key = make_cache_key(self.model_name, prompt, {"json_mode": json_mode})
+        cached = self.cache.get(key)
+        if cached is not None:
+            metrics.record_call(operation, time.perf_counter() - started, len(prompt), len(cached), "hit")
+            return cached
+
+        method = self.backend.generate_json if json_mode else self.backend.generate
+        call_info = {"attempts": 0}
         try:
-            # Configure the generative AI model
-            genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-            self.model = genai.GenerativeModel('gemini-2.5-flash')
+            text = await self._call_backend(method, prompt, call_info)
         except Exception as e:
-            # Handle cases where the API key is not set or invalid
-            raise ValueError("Failed to configure Gemini API. Please check your API key.") from e
+            metrics.record_call(operation, time.perf_counter() - started, len(prompt), 0, "miss",
+                                error=type(e).__name__, attempts=call_info["attempts"])
+            raise
+        latency = time.perf_counter() - started
+        metrics.record_call(operation, latency, len(prompt), len(text or ""), "miss", attempts=call_info["attempts"])
+
+        if text and (validate is None or validate(text)):
+            self.cache.set(key, text, latency=latency)
+        return text
+
+    async def _acquire_slot(self):
+        """Take a concurrency slot and a rate-limit token for a model call"""
+        await self._semaphore.acquire()
+        try:
+            await self._rate_limiter.acquire()
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+    def submit(self, coro):
+        """Start an assistant coroutine (e.g. ``agenerate_quiz(text)``) in the background.
+
+        Returns a concurrent.futures.Future; cancelling it cancels the model calls still in flight.
+        """
+        return self._loop.submit(coro)
+
+    def get_cache_stats(self):
+        """Return response cache hit/miss counters"""
+        return self.cache.get_stats()
     
-    def generate_summary(self, document_text):
-        """Generate a 150-word summary of the document"""
+    def _generate_stream(self, prompt, operation="stream", json_mode=False, validate=None):
+        """Stream the model's response as text chunks.
+
+        A cached response is yielded in one piece. Otherwise chunks are yielded as
+        they arrive and the full text is cached once the stream completes (and, if
+        given, is accepted by ``validate``). Failures before the first chunk are
+        retried like other calls; a stream that breaks part way through is not restarted.
+        """
+        metrics = get_metrics()
+        started = time.perf_counter()
+        # Same key as _agenerate, so streamed and blocking calls share cached responses
+        key = make_cache_key(self.model_name, prompt, {"json_mode": json_mode})
+        cached = self.cache.get(key)
+        if cached is not None:
+            metrics.record_call(operation, time.perf_counter() - started, len(prompt), len(cached), "hit",
+                                first_chunk_latency=time.perf_counter() - started)
+            yield cached
+            return
+
+        parts = []
+        attempt = 0
+        first_chunk_latency = None
         try:
-            prompt = f"Summarize the following document in about 150 words:\n\n{document_text}"
+            while True:
+                self._loop.run(self._acquire_slot())
+                try:
+                    stream = self.backend.stream_json if json_mode else self.backend.stream
+                    for text in stream(prompt, timeout=self.call_timeout):
+                        if text:
+                            if first_chunk_latency is None:
+                                first_chunk_latency = time.perf_counter() - started
+                            parts.append(text)
+                            yield text
+                    break
+                except Exception as e:
+                    if parts or attempt >= self.max_retries or not is_retryable(e):
+                        raise
+                    attempt += 1
+                finally:
+                    self._loop.call_soon(self._semaphore.release)
+                time.sleep(backoff_delay(attempt - 1))
+        except BaseException as e:
+            # Includes GeneratorExit when the consumer stops reading part way through
+            metrics.record_call(operation, time.perf_counter() - started, len(prompt), sum(map(len, parts)), "miss",
+                                error=type(e).__name__, attempts=attempt + 1, first_chunk_latency=first_chunk_latency)
+            raise
+
+        full_text = "".join(parts)
+        latency = time.perf_counter() - started
+        metrics.record_call(operation, latency, len(prompt), len(full_text), "miss",
+                            attempts=attempt + 1, first_chunk_latency=first_chunk_latency)
+        if full_text and (validate is None or validate(full_text)):
+            self.cache.set(key, full_text, latency=latency)
+
+    async def _summary_prompt(self, document_text):
+        """Build the summary prompt, map-reducing long documents into partial summaries first"""
+        if estimate_tokens(document_text) <= self.map_reduce_threshold_tokens:
+            return f"Summarize the following document in about 150 words:\n\n{document_text}"
+
+        partial_summaries = await self._summarize_sections(document_text)
+        sections = "\n\n".join(
+            f"Section {i + 1}:\n{summary}" for i, summary in enumerate(partial_summaries)
+        )
+        return (
+            "The following are summaries of consecutive sections of a single document. "
+            f"Combine them into one summary of the whole document in about 150 words:\n\n{sections}"
+        )
+
+    async def _summarize_sections(self, document_text):
+        """Map step: summarize each section of a long document concurrently, in document order"""
+        chunk_chars = self.summary_chunk_tokens * 4
+        chunks = split_into_chunks(document_text, chunk_chars=chunk_chars, overlap_chars=chunk_chars // 20)
+        # Bound this summary's share of the global concurrency limit
+        workers = asyncio.Semaphore(self.summary_workers)
+
+        async def summarize(chunk):
+            prompt = (
+                f"Summarize part {chunk.index + 1} of {len(chunks)} of a longer document in about "
+                "150 words. Keep the key facts, names and figures.\n\n"
+                f"{chunk.text}"
+            )
+            async with workers:
+                return await self._agenerate(prompt, operation="summary_section") or ""
+
+        return list(await asyncio.gather(*(summarize(chunk) for chunk in chunks)))
+
+    async def _summary(self, document_text):
+        try:
+            prompt = await self._summary_prompt(document_text)
             
-            response = self.model.generate_content(prompt)
+            response_text = await self._agenerate(prompt, operation="summary")
             
-            return response.text or "Unable to generate summary"
+            return response_text or "Unable to generate summary"
         
         except Exception as e:
-            return f"Error generating summary: {str(e)}"
-    
-    def answer_question(self, document_text, question):
-        """Answer a question based solely on the document content with justification."""
+            return f"Error generating summary: {_describe_error(e)}"
+
+    def generate_summary(self, document_text):
+        """Generate a 150-word summary of the document"""
+        return self._loop.run(self._summary(document_text))
+
+    async def agenerate_summary(self, document_text):
+        """Async version of generate_summary"""
+        return await self._loop.run_async(self._summary(document_text))
+
+    def generate_summary_stream(self, document_text):
+        """Generate the document summary, yielding text as it is produced"""
+        produced = False
         try:
-            prompt = f"""
+            prompt = self._loop.run(self._summary_prompt(document_text))
+            for text in self._generate_stream(prompt, operation="summary_stream"):
+                produced = True
+                yield text
+            if not produced:
+                yield "Unable to generate summary"
+        except Exception as e:
+            yield f"Error generating summary: {_describe_error(e)}"
+    
+    def build_question_context(self, document_text, question, index=None, token_budget=None):
+        """Return the document context to send with a question.
+
+        With a chunk index only the best matching excerpts are sent, up to
+        ``token_budget`` (default ``context_token_budget``); without one the whole
+        document is used.
+        """
+        if index is None:
+            return document_text
+        return index.build_context(question, self.context_top_k, token_budget or self.context_token_budget)
+
+    def build_question_prompt(self, document_text, question, index=None, history: ConversationMemory = None,
+                              budget_info=None):
+        """Build the Q&A prompt, including the conversation history if given.
+
+        The history comes out of ``context_token_budget``: document excerpts get
+        whatever it leaves (at least a quarter), so the prompt stays the same size
+        however long the chat gets. ``budget_info``, if given, is filled with estimated
+        token counts for the document, history, question and instructions, and the total.
+        """
+        history_text = history.render() if history is not None else ""
+        history_tokens = estimate_tokens(history_text) if history_text else 0
+        document_budget = max(self.context_token_budget - history_tokens, self.context_token_budget // 4)
+        context = self.build_question_context(document_text, question, index, document_budget)
+        prompt = self._question_prompt(context, question, history_text)
+
+        if budget_info is not None:
+            budget_info.update(
+                document=estimate_tokens(context),
+                history=history_tokens,
+                question=estimate_tokens(question),
+                total=estimate_tokens(prompt),
+                budget=self.context_token_budget,
+            )
+            budget_info["instructions"] = max(
+                budget_info["total"] - budget_info["document"] - budget_info["history"] - budget_info["question"], 0
+            )
+        return prompt
+
+    def _question_prompt(self, context, question, history_text=""):
+        """Build the grounded Q&A prompt"""
+        history_section = ""
+        if history_text:
+            history_section = f"""
+
+            **Earlier Conversation (use it only to understand what the question refers to):**
+            ---
+            {history_text}
+            ---"""
+        return f"""
             You are an AI assistant for a document analysis tool. Your primary function is to answer questions based *only* on the provided document content.
 
             **Crucial Rules:**
@@ -45,8 +369,8 @@ class AIAssistant:
 
             **Document Text:**
             ---
-            {document_text}
-            ---
+            {context}
+            ---{history_section}
 
             **Question:** {question}
 
@@ -54,19 +378,145 @@ class AIAssistant:
             Answer: [Your answer here]
             Justification: "[Direct quote from the document that supports your answer]"
             """
+
+    def compact_history(self, history: ConversationMemory):
+        """Fold the oldest turns of ``history`` into its rolling summary if it is over budget"""
+        return self._loop.run(self._compact_history(history))
+
+    async def _compact_history(self, history):
+        turns = history.turns_to_compact()
+        if not turns:
+            return
+        transcript = "\n\n".join(turn.render() for turn in turns)
+        prompt = f"""
+            You are maintaining a running summary of a conversation between a user and an assistant about a document.
+
+            **Summary So Far:**
+            {history.summary or "(none)"}
+
+            **New Turns:**
+            ---
+            {transcript}
+            ---
+
+            Rewrite the summary so it also covers the new turns. Keep the facts, names and figures that later questions might refer to. Use at most {history.summary_token_budget * 3 // 4} words and output only the summary.
+            """
+        summary = None
+        try:
+            summary = await self._agenerate(prompt, operation="history_summary")
+        except Exception as e:
+            logging.error(f"Error summarizing conversation history: {e}")
+        if not summary:
+            # Keep at least the questions that were asked
+            summary = " ".join(filter(None, [history.summary] + [f"Asked: {turn.question}" for turn in turns]))
+        history.apply_compaction(summary, len(turns))
+
+    async def _answer(self, document_text, question, index, history, budget_info):
+        _set_answered(budget_info, False)
+        try:
+            if history is not None:
+                await self._compact_history(history)
+            prompt = self.build_question_prompt(document_text, question, index, history, budget_info)
             
-            response = self.model.generate_content(prompt)
+            response_text = await self._agenerate(prompt, operation="answer")
             
-            return response.text or "Unable to generate answer"
+            _set_answered(budget_info, bool(response_text))
+            return response_text or "Unable to generate answer"
         
         except Exception as e:
-            return f"Error answering question: {str(e)}"
+            return f"Error answering question: {_describe_error(e)}"
+
+    def answer_question(self, document_text, question, index: ChunkIndex = None,
+                        history: ConversationMemory = None, budget_info=None):
+        """Answer a question based solely on the document content with justification.
+
+        Earlier turns in ``history`` are sent along (compacting it first if needed) so
+        follow-up questions work; the new turn is not added to it. ``budget_info``, if
+        given, also gets ``answered``: False when the text returned is an error or
+        fallback message, which should not be recorded as a turn.
+        """
+        return self._loop.run(self._answer(document_text, question, index, history, budget_info))
+
+    async def aanswer_question(self, document_text, question, index: ChunkIndex = None,
+                               history: ConversationMemory = None, budget_info=None):
+        """Async version of answer_question"""
+        return await self._loop.run_async(self._answer(document_text, question, index, history, budget_info))
+
+    def answer_question_stream(self, document_text, question, index: ChunkIndex = None,
+                               history: ConversationMemory = None, budget_info=None):
+        """Answer a question, yielding the answer text as it is produced.
+
+        ``budget_info["answered"]`` is set as in answer_question once the stream ends.
+        """
+        produced = False
+        _set_answered(budget_info, False)
+        try:
+            if history is not None:
+                self.compact_history(history)
+            prompt = self.build_question_prompt(document_text, question, index, history, budget_info)
+            for text in self._generate_stream(prompt, operation="answer_stream"):
+                produced = True
+                yield text
+            if not produced:
+                yield "Unable to generate answer"
+            _set_answered(budget_info, produced)
+        except Exception as e:
+            yield f"Error answering question: {_describe_error(e)}"
     
     def generate_quiz(self, document_text):
         """Generate 3 logic-based quiz questions from the document"""
+        return self._loop.run(self._quiz(document_text))
+
+    async def agenerate_quiz(self, document_text):
+        """Async version of generate_quiz"""
+        return await self._loop.run_async(self._quiz(document_text))
+
+    def generate_quiz_stream(self, document_text):
+        """Generate the quiz, yielding each question as soon as it has arrived in full.
+
+        Malformed questions are skipped while streaming; once the stream ends, the
+        missing ones are regenerated in one extra call instead of repeating the quiz.
+        """
+        questions = []
+        parser = JsonArrayParser()
+
+        def complete(raw_items):
+            for raw in raw_items:
+                question = _quiz_question(raw)
+                if question is None:
+                    logging.error(f"Dropped malformed quiz question: {raw}")
+                    continue
+                questions.append(question)
+                yield question
+
         try:
-            prompt = f"""
-            You are an AI assistant creating a quiz for a document analysis tool. Your task is to generate 3 challenging, logic-based questions that test a user's understanding of the provided document.
+            for text in self._generate_stream(
+                self._quiz_prompt(document_text),
+                operation="quiz_stream",
+                json_mode=True,
+                validate=_is_json
+            ):
+                yield from complete(parser.feed(text))
+            # An element still open here was cut off by the end of the stream
+            yield from complete(parser.close())
+        except Exception as e:
+            logging.error(f"Error streaming quiz: {e}")
+
+        missing = QUIZ_QUESTION_COUNT - len(questions)
+        if missing > 0:
+            yield from self._loop.run(self._replacement_questions(document_text, questions, missing))
+
+    def _quiz_prompt(self, document_text, count=QUIZ_QUESTION_COUNT, avoid=()):
+        """Build the quiz prompt; ``avoid`` lists questions already asked that must not be repeated"""
+        avoid_section = ""
+        if avoid:
+            listed = "\n".join(f"- {question}" for question in avoid)
+            avoid_section = f"""
+
+            **Already Asked (do not repeat these):**
+            {listed}"""
+        return f"""
+            You are an AI assistant creating a quiz for a document analysis tool. Your task is to generate {count} challenging, logic-based questions that test a user's understanding of the provided document.
 
             **Crucial Rules:**
             1.  **Logic-Based:** Questions should require inference, understanding of relationships (cause-effect, compare-contrast), or application of concepts found in the text. Avoid simple fact-recall questions.
@@ -76,7 +526,7 @@ class AIAssistant:
             **Document Text:**
             ---
             {document_text}
-            ---
+            ---{avoid_section}
 
             **JSON Output Example:**
             [
@@ -90,25 +540,49 @@ class AIAssistant:
                 }}
             ]
             """
-            response = self.model.generate_content(
-                prompt,
-                generation_config=genai.types.GenerationConfig(
-                    response_mime_type="application/json"
-                )
+
+    async def _quiz(self, document_text):
+        try:
+            response_text = await self._agenerate(
+                self._quiz_prompt(document_text),
+                json_mode=True,
+                validate=_is_json,
+                operation="quiz"
             )
-            
-            try:
-                return json.loads(response.text)
-            except json.JSONDecodeError:
-                logging.error(f"Failed to decode JSON for quiz generation. Raw text: {response.text}")
-                return []
+            # Keep the well-formed questions and only regenerate the rest
+            questions = _parse_quiz(response_text)
+            missing = QUIZ_QUESTION_COUNT - len(questions)
+            if missing > 0:
+                questions += await self._replacement_questions(document_text, questions, missing)
+            return questions
         
         except Exception as e:
             logging.error(f"Error generating quiz: {e}")
             return []
+
+    async def _replacement_questions(self, document_text, questions, count):
+        """Generate ``count`` questions to stand in for malformed or missing ones"""
+        try:
+            response_text = await self._agenerate(
+                self._quiz_prompt(document_text, count, avoid=[question["question"] for question in questions]),
+                json_mode=True,
+                validate=_is_json,
+                operation="quiz_repair"
+            )
+            return _parse_quiz(response_text)[:count]
+        except Exception as e:
+            logging.error(f"Error regenerating quiz questions: {e}")
+            return []
     
     def evaluate_answer(self, document_text, question, user_answer, correct_answer):
         """Evaluate user's answer and provide justified feedback."""
+        return self._loop.run(self._evaluate(document_text, question, user_answer, correct_answer))
+
+    async def aevaluate_answer(self, document_text, question, user_answer, correct_answer):
+        """Async version of evaluate_answer"""
+        return await self._loop.run_async(self._evaluate(document_text, question, user_answer, correct_answer))
+
+    async def _evaluate(self, document_text, question, user_answer, correct_answer):
         try:
             prompt = f"""
             You are an AI assistant evaluating a user's quiz answer for a document analysis tool.
@@ -130,9 +604,107 @@ class AIAssistant:
             **Feedback:**
             """
             
-            response = self.model.generate_content(prompt)
+            response_text = await self._agenerate(prompt, operation="evaluate")
             
-            return response.text or "Unable to evaluate answer"
+            return response_text or "Unable to evaluate answer"
         
         except Exception as e:
-            return f"Error evaluating answer: {str(e)}"
+            return f"Error evaluating answer: {_describe_error(e)}"
+
+    def evaluate_answers(self, document_text, answers, index: ChunkIndex = None, passages_per_question=3):
+        """Grade a whole quiz in one JSON-mode call.
+
+        ``answers`` is a list of (question, user_answer, correct_answer) tuples. Each
+        question carries only the passages most relevant to it. Returns one dict per
+        answer with ``verdict`` and ``feedback`` keys, in the same order.
+        """
+        return self._loop.run(self._evaluate_batch(document_text, answers, index, passages_per_question))
+
+    async def aevaluate_answers(self, document_text, answers, index: ChunkIndex = None, passages_per_question=3):
+        """Async version of evaluate_answers"""
+        return await self._loop.run_async(
+            self._evaluate_batch(document_text, answers, index, passages_per_question)
+        )
+
+    async def _evaluate_batch(self, document_text, answers, index, passages_per_question):
+        answers = [tuple(answer) for answer in answers]
+        if not answers:
+            return []
+
+        results = [
+            {
+                "question": question,
+                "user_answer": user_answer,
+                "correct_answer": correct_answer,
+                "verdict": "unknown",
+                "feedback": "Unable to evaluate answer",
+            }
+            for question, user_answer, correct_answer in answers
+        ]
+
+        try:
+            if index is None:
+                index = ChunkIndex.build(document_text)
+            budget = max(self.context_token_budget // len(answers), 200)
+
+            items = [
+                {
+                    "index": i,
+                    "question": question,
+                    "user_answer": user_answer,
+                    "correct_answer": correct_answer,
+                    "passages": index.build_context(f"{question} {correct_answer}", passages_per_question, budget),
+                }
+                for i, (question, user_answer, correct_answer) in enumerate(answers)
+            ]
+
+            prompt = f"""
+            You are an AI assistant grading a user's quiz answers for a document analysis tool.
+
+            **Crucial Rules:**
+            1.  **Evaluation:** For each item, determine if the user's answer is correct, partially correct, or incorrect based on the provided correct answer and the document passages given with that item.
+            2.  **Justification:** Each feedback MUST explain *why* the user's answer is correct or incorrect, referencing specific information from the passages.
+            3.  **Tone:** Be encouraging and helpful.
+            4.  **JSON Format:** The output MUST be a valid JSON array with one object per item.
+
+            **Answers to grade:**
+            {json.dumps(items, indent=2)}
+
+            **JSON Output Example:**
+            [
+                {{
+                    "index": 0,
+                    "verdict": "partially correct",
+                    "feedback": "You correctly identified the delay, but the document also says phase 3 depends on phase 2..."
+                }}
+            ]
+            """
+            response_text = await self._agenerate(
+                prompt,
+                json_mode=True,
+                validate=_is_json,
+                operation="evaluate_batch"
+            )
+
+            try:
+                graded = json.loads(response_text)
+            except json.JSONDecodeError:
+                logging.error(f"Failed to decode JSON for batch grading. Raw text: {response_text}")
+                return results
+
+            for item in graded if isinstance(graded, list) else []:
+                if not isinstance(item, dict):
+                    continue
+                position = item.get("index")
+                if isinstance(position, int) and not isinstance(position, bool) and 0 <= position < len(results):
+                    # The model's values are untrusted: anything but a non-empty string keeps the default
+                    results[position]["verdict"] = _text_field(item.get("verdict"), "unknown").lower()
+                    results[position]["feedback"] = _text_field(item.get("feedback"), "Unable to evaluate answer")
+
+            return results
+
+        except Exception as e:
+            logging.error(f"Error grading quiz answers: {e}")
+            for result in results:
+                result["feedback"] = f"Error evaluating answer: {_describe_error(e)}"
+            return results
@@ -1,34 +1,40 @@
 import streamlit as st
 import os
-from document_processor import DocumentProcessor
-from ai_assistant import AIAssistant
+import time
+import logging
+from functools import partial
+from content_store import evict_idle_chats, session_memory_report
+from conversation import ConversationMemory
+from metrics import profile_section
+from precompute import ChatTasks, stream_in_background
+from resources import (
+    get_ai_assistant, get_background_executor, get_content_store, get_document_processor, get_quiz_executor
+)
+from retrieval import ChunkIndex, split_into_chunks
+from vector_index import VectorIndex
+
+# Chats idle for longer than this drop their chunk index; it is rebuilt when reopened
+CHAT_IDLE_SECONDS = int(os.getenv("CHAT_IDLE_SECONDS", 15 * 60))
+MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", 200))
+# Documents longer than this get a quick summary of their first pages
+QUICK_SUMMARY_PAGES = int(os.getenv("QUICK_SUMMARY_PAGES", 20))
+# Tokens of earlier Q&A turns sent with each question; older turns are summarized to stay within it
+CHAT_HISTORY_TOKENS = int(os.getenv("CHAT_HISTORY_TOKENS", 1000))
 
 # Initialize session state
-if 'document_text' not in st.session_state:
-    st.session_state.document_text = ""
-if 'document_summary' not in st.session_state:
-    st.session_state.document_summary = ""
-if 'document_name' not in st.session_state:
-    st.session_state.document_name = ""
-if 'current_mode' not in st.session_state:
-    st.session_state.current_mode = "upload"
-if 'quiz_questions' not in st.session_state:
-    st.session_state.quiz_questions = []
-if 'quiz_active' not in st.session_state:
-    st.session_state.quiz_active = False
-if 'current_question_index' not in st.session_state:
-    st.session_state.current_question_index = 0
-if 'quiz_answers' not in st.session_state:
-    st.session_state.quiz_answers = []
-if 'messages' not in st.session_state:
-    # This will be deprecated in favor of chat_history
-    st.session_state.messages = []
 if 'chat_history' not in st.session_state:
     st.session_state.chat_history = []
 if 'current_chat_id' not in st.session_state:
     st.session_state.current_chat_id = None
 if 'sidebar_collapsed' not in st.session_state:
     st.session_state.sidebar_collapsed = False
+if 'chat_tasks' not in st.session_state:
+    # Background work (chunk index, quiz) started for this session's chats
+    st.session_state.chat_tasks = ChatTasks()
+if 'corpus_index' not in st.session_state:
+    # Chunk vectors for every document uploaded in this session, for questions across documents
+    # Holds vectors and chunk offsets only; chunk text is read back from the content store by handle
+    st.session_state.corpus_index = VectorIndex(get_content_store().get)
 
 def get_current_chat():
     """Returns the dictionary for the currently active chat."""
@@ -46,22 +52,36 @@ def start_new_chat():
         "name": f"Chat {len(st.session_state.chat_history) + 1}",
         "messages": [],
         "document_name": None,
-        "document_text": None,
+        # Content-store handle for the document text; the text itself is not kept in session state
+        "document_handle": None,
+        "document_index": None,
+        "last_active": time.time(),
     })
     st.session_state.current_chat_id = new_chat_id
     st.rerun()
 
-def reset_document_state():
-    """Reset all document-related session state"""
-    st.session_state.document_text = ""
-    st.session_state.document_summary = ""
-    st.session_state.document_name = ""
-    st.session_state.current_mode = "upload"
-    st.session_state.quiz_questions = []
-    st.session_state.quiz_active = False
-    st.session_state.current_question_index = 0
-    st.session_state.quiz_answers = []
-    st.session_state.messages = []
+class DocumentExpired(Exception):
+    """The chat's document text is no longer in the content store"""
+
+
+def get_document_text(chat_session):
+    """Load the chat's document text from the shared content store"""
+    text = get_content_store().get(chat_session.get("document_handle"))
+    if text is None:
+        raise DocumentExpired(chat_session.get("document_name"))
+    return text
+
+def expire_document(chat_session):
+    """Forget a document whose text is gone, so the chat asks for it to be uploaded again."""
+    st.session_state.chat_tasks.cancel_chat(chat_session["id"])
+    get_content_store().release(chat_session.get("document_handle"))
+    st.session_state.corpus_index.remove_document(chat_session.get("document_handle"))
+    chat_session["document_handle"] = None
+    chat_session["document_index"] = None
+    chat_session.pop("mode", None)
+    st.warning(
+        f"The document for this chat (`{chat_session.get('document_name')}`) has expired. Please re-upload it."
+    )
 
 def main():
     st.set_page_config(
@@ -121,9 +141,10 @@ def main():
         unsafe_allow_html=True,
     )
     
-    # Initialize processors
-    doc_processor = DocumentProcessor()
-    ai_assistant = AIAssistant()
+    # Shared processors, built once per process rather than on every rerun
+    doc_processor = get_document_processor()
+    ai_assistant = get_ai_assistant()
+    content_store = get_content_store()
     
     # Apply collapsed state via CSS
     if st.session_state.sidebar_collapsed:
@@ -172,19 +193,48 @@ def main():
                 st.session_state.current_chat_id = selected_chat_id
                 st.rerun()
 
+        with st.expander("Memory usage"):
+            report = session_memory_report(
+                st.session_state.chat_history, content_store, st.session_state.corpus_index
+            )
+            st.dataframe(report, hide_index=True, use_container_width=True)
+            store_stats = content_store.get_stats()
+            st.caption(
+                f"Shared document store: {store_stats['memory_entries']} texts, "
+                f"{store_stats['memory_bytes'] / 1024 / 1024:.1f} MB in memory"
+            )
+            extraction_stats = doc_processor.get_cache_stats()
+            st.caption(
+                f"Extraction cache: {extraction_stats['hit_rate']:.0%} hit rate, "
+                f"{extraction_stats['parse_seconds_saved']:.1f}s of parsing saved"
+            )
+
     # Get the current chat object
     current_chat = get_current_chat()
 
+    if current_chat:
+        current_chat["last_active"] = time.time()
+    for idle_chat_id in evict_idle_chats(
+        st.session_state.chat_history, CHAT_IDLE_SECONDS, keep_id=st.session_state.current_chat_id
+    ):
+        st.session_state.chat_tasks.cancel_chat(idle_chat_id)
+
     # Main chat area
     if current_chat:
-        if current_chat.get("document_text"):
+        if current_chat.get("document_handle") and not content_store.contains(current_chat["document_handle"]):
+            expire_document(current_chat)
+        if current_chat.get("document_handle"):
             mode = current_chat.get("mode")
-            if mode == "ask":
-                show_qa_mode(ai_assistant, current_chat)
-            elif mode == "challenge":
-                show_quiz_mode(ai_assistant, current_chat)
-            else:
-                show_interaction_interface(ai_assistant, current_chat)
+            try:
+                if mode == "ask":
+                    show_qa_mode(ai_assistant, current_chat)
+                elif mode == "challenge":
+                    show_quiz_mode(ai_assistant, current_chat)
+                else:
+                    show_interaction_interface(ai_assistant, current_chat)
+            except DocumentExpired:
+                expire_document(current_chat)
+                show_upload_interface(doc_processor, ai_assistant)
         else:
             # If no document is uploaded, show the initial chat screen
             show_initial_view(doc_processor, ai_assistant)
@@ -246,24 +296,67 @@ def show_upload_interface(doc_processor, ai_assistant):
         )
 
     if uploaded_file is not None:
-        with st.spinner("Processing and summarizing document..."):
+        # PROFILE_UPLOADS=cprofile,tracemalloc profiles this block
+        with st.spinner("Processing and summarizing document..."), profile_section("upload"):
             try:
-                text = doc_processor.extract_text(uploaded_file)
+                # Size check and hash only; pages are extracted as they are needed
+                document = doc_processor.open_document(uploaded_file, max_size_mb=MAX_UPLOAD_MB)
+                summary_heading = "**Here is a short summary:**"
+                quick_summary = None
+
+                # Large documents: summarize the first pages while the rest are extracted in the background.
+                # Documents served whole from the extraction cache go straight to the full summary.
+                if document.page_count > QUICK_SUMMARY_PAGES and not document.is_complete and get_current_chat():
+                    document.complete_in_background()
+                    first_pages = document.text(1, QUICK_SUMMARY_PAGES)
+                    if first_pages.strip():
+                        quick_heading = f"**Here is a short summary of the first {QUICK_SUMMARY_PAGES} pages:**"
+                        with st.chat_message("assistant", avatar="🤖"):
+                            st.markdown(quick_heading)
+                            quick_summary = st.write_stream(ai_assistant.generate_summary_stream(first_pages))
+                        summary_heading = "**Here is a summary of the whole document:**"
+
+                # Hashes, full text, page offsets and stats in one result
+                result = document.result()
+                text = result.text
 
                 if text.strip():
                     current_chat = get_current_chat()
                     if current_chat:
-                        current_chat["document_text"] = text
+                        previous_handle = current_chat.get("document_handle")
+                        current_chat["document_handle"] = get_content_store().put(text)
+                        # The chat's pin moves to the new document
+                        get_content_store().release(previous_handle)
+                        if previous_handle and not any(
+                            chat.get("document_handle") == previous_handle for chat in st.session_state.chat_history
+                        ):
+                            # No chat refers to the replaced document any more
+                            st.session_state.corpus_index.remove_document(previous_handle)
+                        current_chat["document_stats"] = result.stats
+                        current_chat["page_offsets"] = result.page_offsets
+                        current_chat["document_index"] = None
+                        # Questions about an earlier document are no context for this one
+                        current_chat["memory"] = ConversationMemory(CHAT_HISTORY_TOKENS)
                         current_chat["document_name"] = uploaded_file.name
                         current_chat["name"] = uploaded_file.name # Set chat name to doc name
+
+                        # The chunk index and the quiz are prepared while the summary streams
+                        start_precompute(ai_assistant, current_chat, text)
                         
-                        summary = ai_assistant.generate_summary(text)
+                        # Stream the summary so the first words show up right away
+                        with st.chat_message("assistant", avatar="🤖"):
+                            st.markdown(summary_heading)
+                            summary = st.write_stream(ai_assistant.generate_summary_stream(text))
                         
                         current_chat["messages"].append(
                             {"role": "assistant", "content": f"I have finished reading `{uploaded_file.name}`."}
                         )
+                        if quick_summary is not None:
+                            current_chat["messages"].append(
+                                {"role": "assistant", "content": f"{quick_heading}\n\n{quick_summary}"}
+                            )
                         current_chat["messages"].append(
-                            {"role": "assistant", "content": f"**Here is a short summary:**\n\n{summary}"}
+                            {"role": "assistant", "content": f"{summary_heading}\n\n{summary}"}
                         )
                     st.rerun()
                 else:
@@ -298,9 +391,19 @@ def show_interaction_interface(ai_assistant, chat_session):
         if st.button("🧠 Challenge Me", use_container_width=True):
             chat_session["mode"] = "challenge"
             with st.spinner("Generating quiz questions..."):
-                quiz_questions = ai_assistant.generate_quiz(chat_session["document_text"])
-                if quiz_questions:
-                    chat_session["quiz_questions"] = quiz_questions
+                # Attach to the quiz started at upload if there is one, otherwise start it now
+                tasks = st.session_state.chat_tasks
+                quiz_stream = tasks.submit(
+                    chat_session["id"], "quiz",
+                    lambda: start_quiz_stream(ai_assistant, get_document_text(chat_session))
+                )
+                tasks.pop(chat_session["id"], "quiz")
+                # The quiz can start as soon as its first question has arrived
+                if not quiz_stream.wait_for(1) and quiz_stream.exception():
+                    logging.error(f"Quiz generation failed: {quiz_stream.exception()}")
+                if quiz_stream.items:
+                    chat_session["quiz_stream"] = quiz_stream
+                    chat_session["quiz_questions"] = quiz_stream.items
                     chat_session["current_question_index"] = 0
                     chat_session["quiz_answers"] = []
                 else:
@@ -308,6 +411,47 @@ def show_interaction_interface(ai_assistant, chat_session):
                     chat_session["mode"] = None # Reset mode
             st.rerun()
 
+def start_quiz_stream(ai_assistant, text):
+    """Generate the quiz in the background; questions are readable from ``.items`` as they arrive."""
+    return stream_in_background(get_quiz_executor(), lambda: ai_assistant.generate_quiz_stream(text))
+
+def start_precompute(ai_assistant, chat_session, text):
+    """Start building the chat's chunk index and quiz in the background."""
+    tasks = st.session_state.chat_tasks
+    # Work still running for a previous document in this chat is no longer needed
+    tasks.cancel_chat(chat_session["id"])
+
+    corpus_index = st.session_state.corpus_index
+    handle, name, page_offsets = chat_session["document_handle"], chat_session["document_name"], chat_session["page_offsets"]
+
+    def build_index():
+        chunks = split_into_chunks(text, page_offsets=page_offsets)
+        corpus_index.add_document(handle, name, chunks=chunks)
+        # The index kept in the chat holds offsets only and reads chunk text back from the store
+        return ChunkIndex(chunks, partial(get_content_store().get, handle))
+
+    tasks.submit(chat_session["id"], "index", lambda: get_background_executor().submit(build_index))
+    tasks.submit(chat_session["id"], "quiz", lambda: start_quiz_stream(ai_assistant, text))
+
+def get_document_index(chat_session):
+    """Return the chat's chunk index, taking it from the background build or building it if it is missing."""
+    if chat_session.get("document_index") is None:
+        index = None
+        future = st.session_state.chat_tasks.pop(chat_session["id"], "index")
+        if future is not None and not future.cancelled():
+            try:
+                index = future.result()
+            except Exception as e:
+                logging.error(f"Background index build failed: {e}")
+        if index is None:
+            index = ChunkIndex.build(
+                get_document_text(chat_session),
+                page_offsets=chat_session.get("page_offsets"),
+                text_source=partial(get_content_store().get, chat_session["document_handle"]),
+            )
+        chat_session["document_index"] = index
+    return chat_session["document_index"]
+
 def show_qa_mode(ai_assistant, chat_session):
     """Handles the 'Ask Anything' mode."""
     st.markdown(f"### 💬 Ask Anything: {chat_session['document_name']}")
@@ -317,6 +461,13 @@ def show_qa_mode(ai_assistant, chat_session):
         with st.chat_message(message["role"], avatar="🤖" if message["role"] == "assistant" else "👤"):
             st.markdown(message["content"])
 
+    corpus_index = st.session_state.corpus_index
+    search_all = st.checkbox(
+        "Search across all my documents",
+        key=f"search_all_{chat_session['id']}",
+        disabled=corpus_index.document_count < 2,
+    )
+
     # Chat input
     if prompt := st.chat_input("Ask a question about your document..."):
         # Add user message to chat history
@@ -325,16 +476,32 @@ def show_qa_mode(ai_assistant, chat_session):
             st.markdown(prompt)
 
         # Get AI response
+        memory = chat_session.setdefault("memory", ConversationMemory(CHAT_HISTORY_TOKENS))
+        budget_info = {}
         with st.chat_message("assistant", avatar="🤖"):
-            with st.spinner("Thinking..."):
-                response = ai_assistant.answer_question(
-                    chat_session["document_text"], 
-                    prompt
+            # Also waits for the background build, which adds this document to the corpus index
+            document_index = get_document_index(chat_session)
+            response = st.write_stream(
+                ai_assistant.answer_question_stream(
+                    get_document_text(chat_session), 
+                    prompt,
+                    index=corpus_index if search_all else document_index,
+                    history=memory,
+                    budget_info=budget_info
+                )
+            )
+            if "total" in budget_info:
+                st.caption(
+                    f"Prompt ≈ {budget_info['total']} tokens: document {budget_info['document']}, "
+                    f"history {budget_info['history']} ({len(memory)} earlier turns), "
+                    f"question {budget_info['question']}, instructions {budget_info['instructions']}"
                 )
-                st.markdown(response)
         
         # Add AI response to chat history
         chat_session["messages"].append({"role": "assistant", "content": response})
+        # Error and fallback messages are shown but are no context for later questions
+        if budget_info.get("answered"):
+            memory.add_turn(prompt, response)
 
 def show_quiz_mode(ai_assistant, chat_session):
     """Handles the 'Challenge Me' mode."""
@@ -347,19 +514,44 @@ def show_quiz_mode(ai_assistant, chat_session):
 
     question_index = chat_session.get("current_question_index", 0)
 
+    # Later questions may still be streaming in; wait only when the user has caught up with them
+    quiz_stream = chat_session.get("quiz_stream")
+    if quiz_stream is not None and question_index >= len(quiz_questions) and not quiz_stream.done():
+        with st.spinner("Generating the next question..."):
+            quiz_stream.wait_for(question_index + 1)
+
+    # Grading at the end sends every answer in one call instead of one call per question
+    chat_session["grade_at_end"] = st.toggle(
+        "Grade all answers at the end",
+        value=chat_session.get("grade_at_end", False),
+        disabled=bool(chat_session["quiz_answers"]),
+    )
+
     if question_index < len(quiz_questions):
         current_q = quiz_questions[question_index]
         
         st.markdown(f"**Question {question_index + 1}/{len(quiz_questions)}:**")
+        if quiz_stream is not None and not quiz_stream.done():
+            st.caption("More questions are still being generated.")
         st.markdown(f"<div class='question-box'>{current_q['question']}</div>", unsafe_allow_html=True)
         
         user_answer = st.text_area("Your answer:", key=f"answer_{question_index}")
 
         if st.button("Submit Answer", key=f"submit_{question_index}"):
             if user_answer.strip():
+                if chat_session["grade_at_end"]:
+                    chat_session["quiz_answers"].append({
+                        "question": current_q['question'],
+                        "user_answer": user_answer,
+                        "correct_answer": current_q['answer'],
+                        "feedback": None
+                    })
+                    chat_session["current_question_index"] += 1
+                    st.rerun()
+
                 with st.spinner("Evaluating your answer..."):
                     feedback = ai_assistant.evaluate_answer(
-                        chat_session["document_text"],
+                        get_document_text(chat_session),
                         current_q['question'],
                         user_answer,
                         current_q['answer']
@@ -370,6 +562,7 @@ def show_quiz_mode(ai_assistant, chat_session):
                     chat_session["quiz_answers"].append({
                         "question": current_q['question'],
                         "user_answer": user_answer,
+                        "correct_answer": current_q['answer'],
                         "feedback": feedback
                     })
                     
@@ -380,6 +573,19 @@ def show_quiz_mode(ai_assistant, chat_session):
                 st.warning("Please enter your answer before submitting.")
 
     else:
+        ungraded = [answer for answer in chat_session["quiz_answers"] if answer["feedback"] is None]
+        if ungraded:
+            with st.spinner("Grading your answers..."):
+                graded = ai_assistant.evaluate_answers(
+                    get_document_text(chat_session),
+                    [(a["question"], a["user_answer"], a["correct_answer"]) for a in ungraded],
+                    index=get_document_index(chat_session)
+                )
+                for answer_data, result in zip(ungraded, graded):
+                    answer_data["feedback"] = result["feedback"]
+                    if result["verdict"] != "unknown":
+                        answer_data["feedback"] = f"**{result['verdict'].capitalize()}.** {result['feedback']}"
+
         st.success("You have completed the challenge! 🎉")
         st.balloons()
         
@@ -0,0 +1,130 @@
+"""Compare document storage before and after compressed, deferred content.
+
+"Before" is the previous schema (plain Text content loaded with every row),
+"after" is the current Document model. Both run against throwaway SQLite files.
+
+    python -m benchmarks.bench_document_storage --documents 200 --kb 200
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+
+from sqlalchemy import Column, DateTime, Integer, String, Text, create_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from database import Base, DatabaseManager
+
+LegacyBase = declarative_base()
+
+
+class LegacyDocument(LegacyBase):
+    """The documents table as it was before compression and deferral"""
+    __tablename__ = "documents"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    filename = Column(String, nullable=False)
+    content = Column(Text, nullable=False)
+    content_hash = Column(String, unique=True, nullable=False)
+    summary = Column(Text)
+    word_count = Column(Integer)
+    character_count = Column(Integer)
+    created_at = Column(DateTime)
+
+
+def synthetic_text(size_bytes, seed):
+    """Word salad with a natural-language-like vocabulary, so compression ratios are realistic"""
+    rng = random.Random(seed)
+    vocabulary = [
+        "the", "of", "and", "to", "in", "report", "analysis", "revenue", "growth", "project",
+        "phase", "customer", "market", "results", "quarter", "risk", "strategy", "team", "data",
+        "increase", "decrease", "significant", "forecast", "budget", "operations", "product",
+    ] + [f"term{i}" for i in range(400)]
+    words = []
+    length = 0
+    while length < size_bytes:
+        word = rng.choice(vocabulary)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def bench_legacy(path, texts, repeat):
+    engine = create_engine(f"sqlite:///{path}")
+    LegacyBase.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    ids = []
+    with Session() as session:
+        for i, text in enumerate(texts):
+            doc = LegacyDocument(filename=f"doc{i}.txt", content=text, content_hash=str(i),
+                                 word_count=len(text.split()), character_count=len(text))
+            session.add(doc)
+            session.flush()
+            ids.append(doc.id)
+        session.commit()
+
+    def list_recent():
+        with Session() as session:
+            session.query(LegacyDocument).order_by(LegacyDocument.created_at.desc()).limit(10).all()
+
+    def get_one():
+        with Session() as session:
+            session.query(LegacyDocument).filter_by(id=ids[len(ids) // 2]).first().content
+
+    result = {"list_seconds": timed(list_recent, repeat), "get_seconds": timed(get_one, repeat)}
+    engine.dispose()
+    result["file_bytes"] = os.path.getsize(path)
+    return result
+
+
+def bench_current(path, texts, repeat):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    manager = DatabaseManager(sessionmaker(bind=engine, expire_on_commit=False))
+    ids = [manager.save_document(f"doc{i}.txt", text) for i, text in enumerate(texts)]
+
+    result = {
+        "list_seconds": timed(lambda: manager.get_recent_documents(10), repeat),
+        "get_seconds": timed(lambda: manager.get_document(ids[len(ids) // 2]).content, repeat),
+    }
+    engine.dispose()
+    result["file_bytes"] = os.path.getsize(path)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=100)
+    parser.add_argument("--kb", type=int, default=200, help="size of each document in KB")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    texts = [synthetic_text(args.kb * 1024, seed) for seed in range(args.documents)]
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {
+            "before": bench_legacy(os.path.join(tmp, "legacy.db"), texts, args.repeat),
+            "after": bench_current(os.path.join(tmp, "current.db"), texts, args.repeat),
+        }
+
+    for label, values in results.items():
+        print(f"{label:>6}: list {values['list_seconds'] * 1000:8.2f} ms  "
+              f"get {values['get_seconds'] * 1000:8.2f} ms  "
+              f"size {values['file_bytes'] / 1024 / 1024:8.2f} MB")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
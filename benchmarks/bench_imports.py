@@ -0,0 +1,71 @@
+"""Measure the import cost of each application module with ``python -X importtime``.
+
+Each module is imported in a fresh interpreter, several times; the median
+cumulative import time is reported in milliseconds.
+
+    python -m benchmarks.bench_imports --repeat 5 --output import_times.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+MODULES = [
+    "database",
+    "ai_assistant",
+    "document_processor",
+    "retrieval",
+    "llm_cache",
+    "llm_backends",
+    "resources",
+]
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_time_us(module):
+    """Cumulative import time of ``module`` in microseconds, from a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # Lines look like: "import time:       123 |       4567 | package.module"
+    for line in reversed(result.stderr.splitlines()):
+        if not line.startswith("import time:"):
+            continue
+        _, self_us, cumulative_us, name = [part.strip() for part in line.replace("import time:", "|").split("|")]
+        if name == module:
+            return int(cumulative_us)
+    raise RuntimeError(f"No importtime entry found for {module}")
+
+
+def measure(modules, repeat):
+    return {
+        module: statistics.median(import_time_us(module) for _ in range(repeat)) / 1000
+        for module in modules
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    args = parser.parse_args()
+
+    results = measure(args.modules, args.repeat)
+    for module, milliseconds in results.items():
+        print(f"{module:<20} {milliseconds:9.1f} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"import_ms": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Deterministic synthetic PDF and TXT documents for benchmarks.
+
+The same ``seed`` and page count always produce byte-identical files, so results
+are comparable across runs and machines.
+
+    python -m benchmarks.corpus /tmp/corpus --pages 1 10 100 2000
+"""
+import argparse
+import os
+import random
+import textwrap
+from typing import List
+
+VOCABULARY = [
+    "the", "of", "and", "to", "in", "report", "analysis", "revenue", "growth", "project",
+    "phase", "customer", "market", "results", "quarter", "risk", "strategy", "team", "data",
+    "increase", "decrease", "significant", "forecast", "budget", "operations", "product",
+] + [f"term{i}" for i in range(400)]
+
+LINES_PER_PAGE = 40
+LINE_CHARS = 90
+
+
+def synthetic_pages(page_count, seed=0, words_per_page=300) -> List[str]:
+    """Page texts of word salad, with a paragraph break every few sentences"""
+    rng = random.Random(seed)
+    pages = []
+    for page_number in range(1, page_count + 1):
+        sentences = []
+        remaining = words_per_page
+        while remaining > 0:
+            length = min(remaining, rng.randint(8, 20))
+            words = [rng.choice(VOCABULARY) for _ in range(length)]
+            sentences.append(" ".join(words).capitalize() + ".")
+            remaining -= length
+        paragraphs = [" ".join(sentences[i:i + 4]) for i in range(0, len(sentences), 4)]
+        pages.append(f"Section {page_number}\n\n" + "\n\n".join(paragraphs))
+    return pages
+
+
+def make_txt(pages: List[str]) -> bytes:
+    return "\n".join(pages).encode("utf-8")
+
+
+def _pdf_string(text):
+    return "(" + text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
+
+
+def make_pdf(pages: List[str]) -> bytes:
+    """A minimal uncompressed PDF with one Helvetica text stream per page"""
+    page_count = len(pages)
+    font_id = 3 + 2 * page_count
+    kids = " ".join(f"{3 + 2 * i} 0 R" for i in range(page_count))
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{kids}] /Count {page_count} >>".encode(),
+    ]
+    for i, text in enumerate(pages):
+        lines = []
+        for paragraph in text.split("\n"):
+            lines.extend(textwrap.wrap(paragraph, LINE_CHARS) or [""])
+        operators = " T* ".join(f"{_pdf_string(line)} Tj" for line in lines[:LINES_PER_PAGE * 2])
+        content = f"BT /F1 8 Tf 9 TL 36 756 Td {operators} ET".encode("latin-1")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * i} 0 R "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def write_corpus(directory, page_counts, seed=0) -> List[str]:
+    """Write one PDF and one TXT per page count; returns the file paths"""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for page_count in page_counts:
+        pages = synthetic_pages(page_count, seed=seed + page_count)
+        for extension, data in (("pdf", make_pdf(pages)), ("txt", make_txt(pages))):
+            path = os.path.join(directory, f"synthetic_{page_count}p.{extension}")
+            with open(path, "wb") as f:
+                f.write(data)
+            paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directory")
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 100, 2000])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for path in write_corpus(args.directory, args.pages, args.seed):
+        print(f"{path}  {os.path.getsize(path) / 1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""Benchmark suite for extraction, document stats, the database layer and AIAssistant.
+
+Everything runs offline: documents come from benchmarks.corpus, the database is a
+throwaway SQLite file and the model is FakeBackend. Results are written as JSON
+and can be compared against a stored baseline; any benchmark whose median is
+more than ``--threshold`` slower than the baseline is flagged and the run exits
+with status 1.
+
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --pages 1 10 100 --baseline results.json --threshold 0.2
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.corpus import make_pdf, make_txt, synthetic_pages
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Suite:
+    """Collects timings as name -> samples"""
+
+    def __init__(self, repeat, filter_text=None):
+        self.repeat = repeat
+        self.filter_text = filter_text
+        self.results = {}
+
+    def run(self, name, fn, repeat=None, **info):
+        if self.filter_text and self.filter_text not in name:
+            return
+        samples = []
+        for _ in range(repeat or self.repeat):
+            started = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - started)
+        self.results[name] = dict(
+            info, median=statistics.median(samples), min=min(samples), samples=samples
+        )
+        print(f"{name:<55} {self.results[name]['median'] * 1000:10.2f} ms", flush=True)
+
+
+def upload(name, data):
+    uploaded_file = io.BytesIO(data)
+    uploaded_file.name = name
+    return uploaded_file
+
+
+def bench_extraction(suite, corpus):
+    from document_processor import EXTRACTOR_VERSION, DocumentProcessor
+    from extraction_cache import ExtractionCache
+
+    # No cache tier retains anything, so every run parses from scratch
+    serial = DocumentProcessor(max_workers=1, cache=ExtractionCache(EXTRACTOR_VERSION, max_memory_entries=0))
+    parallel = DocumentProcessor(cache=ExtractionCache(EXTRACTOR_VERSION, max_memory_entries=0))
+    cached = DocumentProcessor(max_workers=1, cache=ExtractionCache(EXTRACTOR_VERSION))
+
+    for page_count, files in corpus.items():
+        pdf, txt = files["pdf"], files["txt"]
+        # Large PDFs take seconds per run; fewer repeats keep the suite practical
+        repeat = 1 if page_count >= 1000 else None
+        suite.run(f"extract_text.pdf.serial.{page_count}p", lambda: serial.extract_text(upload("a.pdf", pdf)),
+                  repeat=repeat, pages=page_count, bytes=len(pdf))
+        if page_count >= parallel.parallel_min_pages:
+            suite.run(f"extract_text.pdf.parallel.{page_count}p",
+                      lambda: parallel.extract_text(upload("a.pdf", pdf)), repeat=repeat, pages=page_count)
+        cached.extract_text(upload("a.pdf", pdf))
+        suite.run(f"extract_text.pdf.cached.{page_count}p", lambda: cached.extract_text(upload("a.pdf", pdf)),
+                  pages=page_count)
+        suite.run(f"extract_text.txt.{page_count}p", lambda: serial.extract_text(upload("a.txt", txt)),
+                  pages=page_count, bytes=len(txt))
+        text = files["text"]
+        suite.run(f"get_document_stats.{page_count}p", lambda: serial.get_document_stats(text), pages=page_count)
+
+    parallel.close()
+
+
+def bench_database(suite, corpus, directory):
+    from database import Base, DatabaseManager, create_search_index
+    from retrieval import split_into_chunks
+    from vector_index import HashingEmbedder
+
+    engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+    Base.metadata.create_all(engine)
+    create_search_index(engine)
+    manager = DatabaseManager(sessionmaker(bind=engine, expire_on_commit=False))
+
+    texts = {page_count: files["text"] for page_count, files in corpus.items()}
+    largest = max(texts)
+    counter = iter(range(10 ** 9))
+
+    def unique(text):
+        # Documents are deduplicated by content hash, so every write needs new content
+        return f"{text}\n{next(counter)}"
+
+    for page_count, text in texts.items():
+        suite.run(f"db.save_document.{page_count}p", lambda: manager.save_document("bench.txt", unique(text)),
+                  pages=page_count)
+
+    batch = [texts[min(texts)]] * 50
+    suite.run("db.save_documents.50x", lambda: manager.save_documents(
+        [{"filename": f"doc{i}.txt", "content": unique(text)} for i, text in enumerate(batch)]
+    ))
+
+    document_id = manager.save_document("target.txt", texts[largest])
+    suite.run(f"db.get_document.{largest}p", lambda: manager.get_document(document_id).content, pages=largest)
+    suite.run("db.get_recent_documents", lambda: manager.get_recent_documents(10))
+    suite.run("db.get_known_source_hashes", lambda: manager.get_known_source_hashes([str(i) for i in range(500)]))
+
+    qa_pairs = [{"question": f"Question {i} about revenue?", "answer": f"Answer {i} about growth."} for i in range(10)]
+    suite.run("db.save_qa_session", lambda: manager.save_qa_session(document_id, "bench", qa_pairs))
+    suite.run("db.get_qa_history", lambda: manager.get_qa_history(document_id))
+
+    quiz = {
+        "questions": [{}] * 3,
+        "completed": True,
+        "answers": [
+            {"question": f"Q{i}?", "user_answer": "A", "correct_answer": "B", "ai_feedback": "C"} for i in range(3)
+        ],
+    }
+    suite.run("db.save_quiz_session", lambda: manager.save_quiz_session(document_id, "bench", quiz))
+    suite.run("db.get_quiz_history", lambda: manager.get_quiz_history(document_id))
+    suite.run("db.search", lambda: manager.search("revenue growth"))
+    suite.run("db.get_document_stats", lambda: manager.get_document_stats())
+
+    chunks = split_into_chunks(texts[largest])
+    vectors = HashingEmbedder().embed(chunk.text for chunk in chunks)
+    suite.run(f"db.save_chunk_vectors.{largest}p", lambda: manager.save_chunk_vectors(document_id, chunks, vectors),
+              chunks=len(chunks))
+    suite.run(f"db.iter_chunk_vectors.{largest}p", lambda: list(manager.iter_chunk_vectors([document_id])), chunks=len(chunks))
+
+    manager.close_session()
+    engine.dispose()
+
+
+def bench_assistant(suite, corpus):
+    from ai_assistant import AIAssistant
+    from conversation import ConversationMemory
+    from llm_backends import FakeBackend
+    from llm_cache import ResponseCache
+    from retrieval import ChunkIndex
+
+    # A cache that retains nothing, so every call reaches the (instant) fake model
+    assistant = AIAssistant(backend=FakeBackend(), cache=ResponseCache(path=None, max_memory_entries=0),
+                            requests_per_minute=10 ** 9)
+    answers = [("What grew?", "Revenue", "Revenue grew"), ("What fell?", "Costs", "Risk fell")]
+
+    for page_count, files in corpus.items():
+        text = files["text"]
+        index = ChunkIndex.build(text)
+        suffix = f"{page_count}p"
+        history = ConversationMemory()
+        for i in range(20):
+            history.add_turn(f"Earlier question {i} about revenue?", f"Answer {i}: revenue grew. " * 10)
+        runs = {
+            "generate_summary": lambda: assistant.generate_summary(text),
+            "agenerate_summary": lambda: asyncio.run(assistant.agenerate_summary(text)),
+            "generate_summary_stream": lambda: "".join(assistant.generate_summary_stream(text)),
+            "answer_question": lambda: assistant.answer_question(text, "How did revenue grow?", index=index),
+            "aanswer_question": lambda: asyncio.run(
+                assistant.aanswer_question(text, "How did revenue grow?", index=index)
+            ),
+            "answer_question_stream": lambda: "".join(
+                assistant.answer_question_stream(text, "How did revenue grow?", index=index)
+            ),
+            "answer_question.unindexed": lambda: assistant.answer_question(text, "How did revenue grow?"),
+            "answer_question.history": lambda: assistant.answer_question(
+                text, "And what about costs?", index=index, history=history
+            ),
+            "generate_quiz": lambda: assistant.generate_quiz(text),
+            "agenerate_quiz": lambda: asyncio.run(assistant.agenerate_quiz(text)),
+            "generate_quiz_stream": lambda: list(assistant.generate_quiz_stream(text)),
+            "evaluate_answer": lambda: assistant.evaluate_answer(text, "What grew?", "Revenue", "Revenue grew"),
+            "aevaluate_answer": lambda: asyncio.run(
+                assistant.aevaluate_answer(text, "What grew?", "Revenue", "Revenue grew")
+            ),
+            "evaluate_answers": lambda: assistant.evaluate_answers(text, answers, index=index),
+            "aevaluate_answers": lambda: asyncio.run(assistant.aevaluate_answers(text, answers, index=index)),
+        }
+        for name, fn in runs.items():
+            suite.run(f"assistant.{name}.{suffix}", fn, pages=page_count)
+
+
+def build_corpus(page_counts, seed):
+    corpus = {}
+    for page_count in page_counts:
+        pages = synthetic_pages(page_count, seed=seed + page_count)
+        corpus[page_count] = {"pdf": make_pdf(pages), "txt": make_txt(pages), "text": "\n".join(pages)}
+    return corpus
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Return (name, baseline median, current median, ratio) for every benchmark slower than the threshold"""
+    regressions = []
+    for name, current in sorted(results.items()):
+        previous = baseline.get(name)
+        if previous is None or previous["median"] <= 0:
+            continue
+        ratio = current["median"] / previous["median"]
+        flag = "REGRESSION" if ratio > 1 + threshold else ""
+        print(f"{name:<55} {previous['median'] * 1000:10.2f} -> {current['median'] * 1000:10.2f} ms "
+              f"({ratio - 1:+7.1%}) {flag}")
+        if flag:
+            regressions.append((name, previous["median"], current["median"], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 100, 2000],
+                        help="page counts of the synthetic documents")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", choices=["extraction", "database", "assistant"], action="append",
+                        help="run only these groups (repeatable)")
+    parser.add_argument("--filter", help="run only benchmarks whose name contains this text")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="flag benchmarks whose median is this fraction slower than the baseline")
+    args = parser.parse_args(argv)
+
+    groups = args.only or ["extraction", "database", "assistant"]
+    corpus = build_corpus(args.pages, args.seed)
+    suite = Suite(args.repeat, args.filter)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if "extraction" in groups:
+            bench_extraction(suite, corpus)
+        if "database" in groups:
+            bench_database(suite, corpus, tmp)
+        if "assistant" in groups:
+            bench_assistant(suite, corpus)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "pages": args.pages,
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "results": suite.results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        print(f"\nCompared with {args.baseline} (threshold {args.threshold:.0%}):")
+        regressions = compare(suite.results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
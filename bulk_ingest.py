@@ -0,0 +1,232 @@
+"""Bulk-load a directory of PDF and TXT files into the document database.
+
+    python bulk_ingest.py /data/reports --workers 8 --batch-size 100 --summarize
+
+Files are hashed first and skipped if their bytes were already ingested, so no
+parsing work is spent on duplicates. Text is extracted in a process pool, rows
+are written in one transaction per batch, and every committed batch is appended
+to a checkpoint file so an interrupted run resumes where it stopped.
+"""
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+from document_processor import EXTRACTOR_VERSION, DocumentProcessor
+from extraction_cache import ExtractionCache
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.txt')
+
+# One processor per worker process; extraction inside a worker stays serial
+_processor = None
+
+
+def _extract_file(path):
+    """Ingest one file; runs inside a worker process"""
+    global _processor
+    if _processor is None:
+        # Files are deduplicated by hash before extraction, so caching results would not pay off
+        _processor = DocumentProcessor(max_workers=1, cache=ExtractionCache(EXTRACTOR_VERSION, max_memory_entries=0))
+
+    try:
+        with open(path, 'rb') as f:
+            uploaded_file = io.BytesIO(f.read())
+        uploaded_file.name = os.path.basename(path)
+        result = _processor.ingest(uploaded_file)
+        # The joined text is all that is stored; don't send the pages back as well
+        result.pages = []
+        return path, result, None
+    except Exception as e:
+        return path, None, str(e)
+
+
+def find_documents(directory) -> List[str]:
+    """All supported files under a directory, in a stable order"""
+    paths = []
+    for root, _, filenames in os.walk(directory):
+        for filename in filenames:
+            if filename.lower().endswith(SUPPORTED_EXTENSIONS):
+                paths.append(os.path.join(root, filename))
+    return sorted(paths)
+
+
+def hash_file(path, block_size=1024 * 1024):
+    """MD5 of a file's bytes, read in blocks"""
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_checkpoint(path) -> Dict[str, str]:
+    """Map of source hash -> status for files handled by earlier runs"""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A run killed mid-write can leave a partial last line
+                continue
+            done[entry['source_hash']] = entry['status']
+    return done
+
+
+def append_checkpoint(path, entries):
+    with open(path, 'a', encoding='utf-8') as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+async def summarize_all(ai_assistant, texts):
+    """Summaries for a batch; the assistant's own limiter caps concurrent model calls"""
+    return await asyncio.gather(*(ai_assistant.agenerate_summary(text) for text in texts))
+
+
+def embed_documents(db_manager, documents, document_ids):
+    """Chunk, embed and store vectors for newly inserted documents"""
+    from vector_index import HashingEmbedder
+    from retrieval import split_into_chunks
+
+    embedder = HashingEmbedder()
+    for doc in documents:
+        document_id = document_ids.get(doc['content_hash'])
+        if document_id is None:
+            continue
+        chunks = split_into_chunks(doc['content'])
+        db_manager.save_chunk_vectors(document_id, chunks, embedder.embed(chunk.text for chunk in chunks))
+
+
+def ingest(directory, workers=None, batch_size=50, summarize=False, summary_concurrency=4,
+           checkpoint_path=None, retry_failed=False, embed=False):
+    """Ingest every supported file under ``directory``; returns a dict of counters"""
+    from database import db_manager
+
+    checkpoint_path = checkpoint_path or os.path.join(directory, '.ingest_checkpoint.jsonl')
+    done = load_checkpoint(checkpoint_path)
+    skip_statuses = {'saved', 'duplicate'} if retry_failed else {'saved', 'duplicate', 'failed'}
+
+    ai_assistant = None
+    if summarize:
+        from ai_assistant import AIAssistant
+        ai_assistant = AIAssistant(max_concurrency=summary_concurrency)
+
+    started = time.perf_counter()
+    paths = find_documents(directory)
+    stats = {'found': len(paths), 'skipped': 0, 'saved': 0, 'duplicate': 0, 'failed': 0, 'bytes': 0}
+
+    # Deduplicate on raw bytes before any parsing: checkpoint, database, then within this run
+    hashes = {path: hash_file(path) for path in paths}
+    known = db_manager.get_known_source_hashes(sorted(set(hashes.values())))
+    pending = []
+    seen = set()
+    for path in paths:
+        source_hash = hashes[path]
+        if done.get(source_hash) in skip_statuses or source_hash in known or source_hash in seen:
+            stats['skipped'] += 1
+            continue
+        seen.add(source_hash)
+        pending.append(path)
+
+    logging.info(f"Found {len(paths)} files, {len(pending)} to ingest, {stats['skipped']} already known")
+
+    def flush(batch):
+        texts = [result.text for _, result in batch]
+        summaries = asyncio.run(summarize_all(ai_assistant, texts)) if ai_assistant else [None] * len(batch)
+        documents = [
+            {
+                'filename': os.path.basename(path),
+                'content': result.text,
+                'summary': summary,
+                'source_hash': hashes[path],
+                'content_hash': result.content_hash,
+                'word_count': result.stats['word_count'],
+                'character_count': result.stats['character_count'],
+            }
+            for (path, result), summary in zip(batch, summaries)
+        ]
+        result = db_manager.save_documents(documents)
+        if embed:
+            embed_documents(db_manager, documents, result['ids'])
+        stats['saved'] += result['inserted']
+        stats['duplicate'] += result['skipped']
+        # Which rows were skipped as duplicates isn't reported per file; the batch is done either way
+        append_checkpoint(checkpoint_path, [
+            {'path': path, 'source_hash': hashes[path], 'status': 'saved'} for path, _ in batch
+        ])
+
+    batch = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for processed, (path, result, error) in enumerate(executor.map(_extract_file, pending, chunksize=4), 1):
+            stats['bytes'] += os.path.getsize(path)
+            if error:
+                stats['failed'] += 1
+                logging.warning(f"Failed to extract {path}: {error}")
+                append_checkpoint(checkpoint_path, [
+                    {'path': path, 'source_hash': hashes[path], 'status': 'failed', 'error': error}
+                ])
+            else:
+                batch.append((path, result))
+
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+
+            if processed % batch_size == 0 or processed == len(pending):
+                elapsed = time.perf_counter() - started
+                logging.info(
+                    f"{processed}/{len(pending)} files  "
+                    f"{processed / elapsed:.1f} files/s  "
+                    f"{stats['bytes'] / 1024 / 1024 / elapsed:.2f} MB/s"
+                )
+
+        if batch:
+            flush(batch)
+
+    stats['seconds'] = time.perf_counter() - started
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-load a directory of PDF and TXT files into the database")
+    parser.add_argument("directory", help="directory to scan recursively")
+    parser.add_argument("--workers", type=int, default=None, help="extraction processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=50, help="documents per database transaction")
+    parser.add_argument("--summarize", action="store_true", help="generate a summary for each document")
+    parser.add_argument("--summary-concurrency", type=int, default=4, help="concurrent summary requests")
+    parser.add_argument("--checkpoint", default=None,
+                        help="checkpoint file (default: <directory>/.ingest_checkpoint.jsonl)")
+    parser.add_argument("--retry-failed", action="store_true", help="retry files that failed in earlier runs")
+    parser.add_argument("--embed", action="store_true", help="store chunk vectors for cross-document search")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    stats = ingest(
+        args.directory,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        summarize=args.summarize,
+        summary_concurrency=args.summary_concurrency,
+        checkpoint_path=args.checkpoint,
+        retry_failed=args.retry_failed,
+        embed=args.embed,
+    )
+    logging.info(
+        f"Done in {stats['seconds']:.1f}s: {stats['saved']} saved, {stats['duplicate']} duplicate content, "
+        f"{stats['skipped']} skipped, {stats['failed']} failed"
+    )
+
+
+if __name__ == "__main__":
+    main()
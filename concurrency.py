@@ -0,0 +1,91 @@
+import asyncio
+import random
+import threading
+import time
+
+from llm_backends import BackendError
+
+# HTTP status codes worth retrying: timeouts, rate limiting and transient server errors
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+RETRYABLE_ERROR_NAMES = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "DeadlineExceeded",
+    "InternalServerError", "Aborted", "GatewayTimeout",
+}
+
+
+def is_retryable(exc):
+    """Return True for transient failures (429s, timeouts, 5xx) that are worth retrying"""
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError, ConnectionError, BackendError)):
+        return True
+
+    code = getattr(exc, "code", None)
+    if callable(code):
+        # gRPC errors expose the status as a method
+        code = None
+    code = code or getattr(exc, "status_code", None)
+    if code in RETRYABLE_STATUS_CODES:
+        return True
+
+    return type(exc).__name__ in RETRYABLE_ERROR_NAMES
+
+
+def backoff_delay(attempt, base=0.5, cap=20.0):
+    """Exponential backoff with full jitter for the given (0-based) retry attempt"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class TokenBucket:
+    """Async token-bucket rate limiter; use from a single event loop"""
+
+    def __init__(self, rate_per_second, capacity=None):
+        self.rate = rate_per_second
+        self.capacity = capacity or max(1.0, rate_per_second)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    async def acquire(self, tokens=1.0):
+        """Wait until ``tokens`` are available and take them"""
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return
+            await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+
+class BackgroundLoop:
+    """An asyncio event loop running in a daemon thread, shared by sync and async callers"""
+
+    def __init__(self, name="ai-assistant-loop"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name=name, daemon=True)
+        self._thread.start()
+
+    def run(self, coro):
+        """Run a coroutine on the loop and block until it finishes"""
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("BackgroundLoop.run called from the loop thread; await the coroutine instead")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    async def run_async(self, coro):
+        """Await a coroutine on the loop from any event loop"""
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self.loop))
+
+    def submit(self, coro):
+        """Schedule a coroutine on the loop and return a concurrent.futures.Future for it.
+
+        Cancelling the future cancels the coroutine.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call_soon(self, callback, *args):
+        """Schedule a plain callback on the loop from any thread"""
+        self.loop.call_soon_threadsafe(callback, *args)
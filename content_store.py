@@ -0,0 +1,225 @@
+import hashlib
+import logging
+import mmap
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+
+class ContentStore:
+    """Content-addressed text store shared by every session in the process.
+
+    ``put`` returns the SHA-256 of the text as a handle; identical documents
+    uploaded by different users are stored once. Recently used texts stay in an
+    in-memory LRU bounded by ``max_memory_bytes``; everything is also written to
+    ``directory`` and read back through mmap when it has been evicted from memory.
+    The disk tier is pruned oldest-first once it grows past ``max_disk_bytes``, skipping
+    texts that are pinned: every ``put`` pins its handle until a matching ``release``,
+    so a chat's document is never pruned while the chat refers to it. Pins are kept
+    per process and start empty after a restart.
+    """
+
+    def __init__(self, directory=None, max_memory_bytes=256 * 1024 * 1024, max_disk_bytes=2 * 1024 ** 3):
+        self.directory = directory or os.getenv("CONTENT_STORE_PATH", os.path.join(".cache", "content"))
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()  # handle -> (text, size in bytes)
+        self._memory_bytes = 0
+        self._disk_bytes = None  # Measured on the first write
+        self._pins: Dict[str, int] = {}  # handle -> number of puts not yet released
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_reads": 0, "misses": 0, "stores": 0, "deduplicated": 0, "evictions": 0}
+        os.makedirs(self.directory, exist_ok=True)
+
+    def put(self, text: str) -> str:
+        """Store a text and return its handle, pinned until ``release`` is called for it"""
+        data = text.encode("utf-8")
+        handle = hashlib.sha256(data).hexdigest()
+        path = self._path(handle)
+
+        with self._lock:
+            self._pins[handle] = self._pins.get(handle, 0) + 1
+            if handle in self._memory or os.path.exists(path):
+                self._stats["deduplicated"] += 1
+            else:
+                self._stats["stores"] += 1
+            self._remember(handle, text, len(data))
+
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temporary name first so readers never see a partial file
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._prune_disk(len(data))
+        return handle
+
+    def release(self, handle: Optional[str]):
+        """Drop one pin taken by ``put``; the text may be pruned once no pins are left"""
+        if not handle:
+            return
+        with self._lock:
+            count = self._pins.get(handle, 0) - 1
+            if count > 0:
+                self._pins[handle] = count
+            else:
+                self._pins.pop(handle, None)
+
+    def contains(self, handle: Optional[str]) -> bool:
+        """Whether the text for a handle is still stored, without loading it"""
+        if not handle:
+            return False
+        with self._lock:
+            if handle in self._memory:
+                return True
+        return os.path.exists(self._path(handle))
+
+    def get(self, handle: Optional[str]) -> Optional[str]:
+        """Return the text for a handle, or None if it is unknown"""
+        if not handle:
+            return None
+        with self._lock:
+            entry = self._memory.get(handle)
+            if entry is not None:
+                self._memory.move_to_end(handle)
+                self._stats["memory_hits"] += 1
+                return entry[0]
+
+        try:
+            with open(self._path(handle), "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    text = ""
+                else:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                        text = mapped[:].decode("utf-8")
+            os.utime(self._path(handle))
+        except FileNotFoundError:
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+
+        with self._lock:
+            self._stats["disk_reads"] += 1
+            self._remember(handle, text, len(text.encode("utf-8")))
+        return text
+
+    def size(self, handle) -> int:
+        """Stored size in bytes of a text, without loading it"""
+        try:
+            return os.path.getsize(self._path(handle))
+        except OSError:
+            return 0
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return dict(self._stats, memory_entries=len(self._memory), memory_bytes=self._memory_bytes,
+                        disk_bytes=self._disk_bytes, pinned=len(self._pins))
+
+    def _path(self, handle):
+        return os.path.join(self.directory, handle[:2], handle)
+
+    def _remember(self, handle, text, size):
+        """Insert into the memory LRU and evict least recently used texts; caller holds the lock"""
+        if handle in self._memory:
+            self._memory.move_to_end(handle)
+            return
+        if size > self.max_memory_bytes:
+            return
+        self._memory[handle] = (text, size)
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_memory_bytes:
+            _, (_, evicted_size) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted_size
+            self._stats["evictions"] += 1
+
+    def _scan_disk(self):
+        files = []
+        for root, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def _prune_disk(self, added_bytes):
+        """Track disk usage and remove the least recently used unpinned files once over the cap"""
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += added_bytes
+                if self._disk_bytes <= self.max_disk_bytes:
+                    return
+        files = self._scan_disk()
+        total = sum(size for _, size, _ in files)
+        with self._lock:
+            self._disk_bytes = total
+        if total <= self.max_disk_bytes:
+            return
+
+        for _, size, path in sorted(files):
+            handle = os.path.basename(path)
+            # Checked and removed under the lock so a concurrent put can't pin a file being deleted
+            with self._lock:
+                if handle in self._pins:
+                    continue
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logging.warning(f"Could not prune {path}: {e}")
+                    continue
+                entry = self._memory.pop(handle, None)
+                if entry is not None:
+                    self._memory_bytes -= entry[1]
+                self._disk_bytes -= size
+            total -= size
+            if total <= self.max_disk_bytes:
+                break
+        if total > self.max_disk_bytes:
+            logging.warning(f"Content store is over its {self.max_disk_bytes} byte cap; the rest is pinned by open chats")
+
+
+def evict_idle_chats(chats, idle_seconds, now=None, keep_id=None) -> List[str]:
+    """Drop the rebuildable chunk index from chats idle for ``idle_seconds``.
+
+    The chat keeps its content handle and messages, so it is rebuilt transparently
+    when reopened. Returns the ids of all idle chats.
+    """
+    now = now or time.time()
+    idle = []
+    for chat in chats:
+        if chat["id"] == keep_id or now - chat.get("last_active", now) < idle_seconds:
+            continue
+        chat["document_index"] = None
+        idle.append(chat["id"])
+    return idle
+
+
+def session_memory_report(chats, store: ContentStore = None, corpus_index=None):
+    """Approximate bytes held per chat, split into messages, chunk index and referenced document.
+
+    The session's cross-document vector index, if given, is reported as one more row.
+    """
+    rows = []
+    for chat in chats:
+        index = chat.get("document_index")
+        rows.append({
+            "chat": chat.get("name"),
+            "messages_bytes": sum(len(m["content"].encode("utf-8")) for m in chat.get("messages", [])),
+            "index_bytes": index.memory_bytes() if index is not None else 0,
+            "document_bytes": store.size(chat["document_handle"]) if store and chat.get("document_handle") else 0,
+            "idle_seconds": int(time.time() - chat.get("last_active", time.time())),
+        })
+    if corpus_index is not None:
+        rows.append({
+            "chat": f"All documents ({corpus_index.document_count} in the search index)",
+            "messages_bytes": 0,
+            "index_bytes": corpus_index.memory_bytes(),
+            "document_bytes": 0,
+            "idle_seconds": 0,
+        })
+    return rows
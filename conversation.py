@@ -0,0 +1,78 @@
+from dataclasses import dataclass
+from typing import List
+
+from retrieval import estimate_tokens
+
+
+@dataclass
+class Turn:
+    """One question and its answer"""
+    question: str
+    answer: str
+
+    def render(self):
+        return f"User: {self.question}\nAssistant: {self.answer}"
+
+
+class ConversationMemory:
+    """Earlier turns of a chat, kept within a fixed token budget.
+
+    Recent turns are kept verbatim. Once they no longer fit, the oldest are folded
+    into a rolling summary (see AIAssistant.compact_history), which is itself capped
+    at ``summary_token_budget``. The last ``min_recent_turns`` are never summarized,
+    and ``render`` trims from the oldest end, so the history sent with a question
+    never exceeds ``token_budget`` however long the chat gets.
+    """
+
+    def __init__(self, token_budget=1000, summary_token_budget=None, min_recent_turns=2):
+        self.token_budget = token_budget
+        self.summary_token_budget = summary_token_budget or token_budget // 4
+        self.min_recent_turns = min_recent_turns
+        self.summary = ""
+        self.turns: List[Turn] = []
+        self.compacted_turns = 0
+
+    def __len__(self):
+        return self.compacted_turns + len(self.turns)
+
+    def add_turn(self, question, answer):
+        self.turns.append(Turn(question, answer))
+
+    def turns_to_compact(self) -> List[Turn]:
+        """Oldest verbatim turns that have to be summarized for the rest to fit the budget"""
+        # Verbatim turns get whatever the summary may not use
+        available = self.token_budget - self.summary_token_budget
+        used = sum(estimate_tokens(turn.render()) for turn in self.turns)
+        count = 0
+        while used > available and count < len(self.turns) - self.min_recent_turns:
+            used -= estimate_tokens(self.turns[count].render())
+            count += 1
+        return self.turns[:count]
+
+    def apply_compaction(self, summary, count):
+        """Replace the summary and drop the ``count`` oldest turns it now covers"""
+        max_chars = self.summary_token_budget * 4
+        self.summary = summary.strip()[:max_chars]
+        del self.turns[:count]
+        self.compacted_turns += count
+
+    def render(self) -> str:
+        """The history as prompt text, at most ``token_budget`` tokens"""
+        parts = []
+        if self.summary:
+            parts.append(f"Summary of the earlier conversation: {self.summary}")
+        parts.extend(turn.render() for turn in self.turns)
+        text = "\n\n".join(parts)
+        # Only reached when the protected recent turns alone are over budget
+        max_chars = (self.token_budget - 1) * 4
+        if len(text) > max_chars:
+            text = "..." + text[len(text) - max_chars + 3:]
+        return text
+
+    def tokens(self):
+        return estimate_tokens(self.render()) if self.summary or self.turns else 0
+
+    def clear(self):
+        self.summary = ""
+        self.turns = []
+        self.compacted_turns = 0
@@ -1,49 +1,197 @@
 import PyPDF2
+import hashlib
 import io
-import streamlit as st
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from extraction_cache import ExtractionCache
+from metrics import get_metrics
+
+# Part of every extraction cache key; bump the suffix when extraction logic changes
+EXTRACTOR_VERSION = f"PyPDF2-{PyPDF2.__version__}/1"
+
+@dataclass
+class PageText:
+    """Extracted text of a single page (page numbers are 1-based)"""
+    page_number: int
+    text: str
+
+@dataclass
+class IngestResult:
+    """Everything the app needs about an upload, computed in one pass over its bytes"""
+    filename: str
+    size_bytes: int
+    source_hash: str  # MD5 of the raw file bytes
+    content_hash: str  # MD5 of the extracted text, as stored in Document.content_hash
+    text: str
+    pages: List[PageText]
+    page_offsets: Optional[List[int]]  # None for single-page documents
+    stats: Dict[str, int] = field(default_factory=dict)
+
+def _extract_page_range(pdf_path, start, stop):
+    """Extract pages [start, stop) from a PDF file; runs inside a worker process"""
+    with open(pdf_path, 'rb') as f:
+        pdf_reader = PyPDF2.PdfReader(f)
+        return [
+            PageText(page_num + 1, pdf_reader.pages[page_num].extract_text() or "")
+            for page_num in range(start, stop)
+        ]
+
+def _file_buffer(uploaded_file) -> memoryview:
+    """A read-only view of an upload's bytes, without copying them when the file is in memory"""
+    if hasattr(uploaded_file, 'getbuffer'):
+        # BytesIO (and Streamlit's UploadedFile) expose their buffer directly
+        return uploaded_file.getbuffer().toreadonly()
+    uploaded_file.seek(0)
+    return memoryview(uploaded_file.read())
+
+def text_stats(text) -> Dict[str, int]:
+    """Character, word and paragraph counts of a text"""
+    return {
+        'character_count': len(text),
+        'word_count': len(text.split()),
+        'paragraph_count': sum(1 for p in text.split('\n\n') if p.strip()),
+    }
+
+def join_pages(pages: List[PageText]) -> Tuple[str, List[int]]:
+    """Join page texts into one document and return it with each page's start offset"""
+    texts = [page.text for page in pages]
+    joined = "\n".join(texts)
+    stripped = joined.strip()
+    leading = len(joined) - len(joined.lstrip())
+
+    offsets = []
+    position = 0
+    for text in texts:
+        offsets.append(max(position - leading, 0))
+        position += len(text) + 1
+
+    return stripped, offsets
 
 class DocumentProcessor:
     """Handles document text extraction from various file formats"""
     
-    def __init__(self):
+    def __init__(self, max_workers=None, parallel_min_pages=32, cache: ExtractionCache = None):
         self.supported_formats = ['pdf', 'txt']
+        if cache is None:
+            cache = ExtractionCache(
+                EXTRACTOR_VERSION,
+                path=os.getenv("EXTRACTION_CACHE_PATH", os.path.join(".cache", "extractions.sqlite")),
+                max_disk_bytes=int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", 500 * 1024 * 1024)),
+            )
+        # Re-uploads of the same file skip parsing entirely
+        self.cache = cache
+        # PDFs with fewer pages than this are extracted serially; pool start-up isn't worth it
+        self.parallel_min_pages = parallel_min_pages
+        self.max_workers = max_workers or int(os.getenv("PDF_EXTRACT_WORKERS", os.cpu_count() or 1))
+        self._pool = None
+        self._background_executor = None
+        self._pool_lock = threading.Lock()
     
     def extract_text(self, uploaded_file):
         """Extract text from uploaded file based on its type"""
-        file_extension = uploaded_file.name.split('.')[-1].lower()
-        
-        if file_extension == 'pdf':
-            return self._extract_from_pdf(uploaded_file)
-        elif file_extension == 'txt':
-            return self._extract_from_txt(uploaded_file)
-        else:
-            raise ValueError(f"Unsupported file format: {file_extension}")
-    
-    def _extract_from_pdf(self, uploaded_file):
-        """Extract text from PDF file"""
+        return self.ingest(uploaded_file).text
+
+    def extract_pages(self, uploaded_file) -> List[PageText]:
+        """Extract text page by page; TXT files are returned as a single page"""
+        return self.ingest(uploaded_file).pages
+
+    def get_cache_stats(self):
+        """Extraction cache hit rate and the parse time it has saved"""
+        return self.cache.get_stats()
+
+    def open_document(self, uploaded_file, max_size_mb=None) -> "LazyDocument":
+        """Validate and hash an upload and return a LazyDocument; no pages are extracted yet"""
+        metrics = get_metrics()
+        buffer = _file_buffer(uploaded_file)
         try:
-            # Create a PDF reader object
-            pdf_reader = PyPDF2.PdfReader(io.BytesIO(uploaded_file.read()))
-            
-            # Extract text from all pages
-            text = ""
-            for page_num in range(len(pdf_reader.pages)):
-                page = pdf_reader.pages[page_num]
-                text += page.extract_text() + "\n"
-            
-            if not text.strip():
-                raise ValueError("No text could be extracted from the PDF")
-            
-            return text.strip()
-        
-        except Exception as e:
-            raise ValueError(f"Error extracting text from PDF: {str(e)}")
-    
-    def _extract_from_txt(self, uploaded_file):
-        """Extract text from TXT file"""
+            if max_size_mb is not None:
+                self._check_size(buffer.nbytes, max_size_mb)
+            with metrics.time_stage("hash", bytes=buffer.nbytes):
+                source_hash = hashlib.md5(buffer).hexdigest()
+            size_bytes = buffer.nbytes
+
+            file_extension = uploaded_file.name.split('.')[-1].lower()
+            if file_extension == 'pdf':
+                with metrics.time_stage("cache_lookup"):
+                    cached = self.cache.get(source_hash)
+                pages = [PageText(i + 1, text) for i, text in enumerate(cached)] if cached is not None else None
+            elif file_extension == 'txt':
+                with metrics.time_stage("decode_txt", bytes=buffer.nbytes):
+                    pages = [PageText(1, self._decode_txt(buffer))]
+            else:
+                raise ValueError(f"Unsupported file format: {file_extension}")
+        finally:
+            # Release the view so the uploaded file can be resized or closed again
+            buffer.release()
+
+        with metrics.time_stage("open"):
+            return LazyDocument(self, uploaded_file, source_hash, size_bytes, pages)
+
+    def ingest(self, uploaded_file, max_size_mb=None) -> IngestResult:
+        """Validate, hash, extract and measure an upload in a single pass over its bytes.
+
+        The bytes are viewed through a memoryview rather than copied; large PDFs are
+        spilled to one temporary file that every extraction worker reads.
+        """
+        return self.open_document(uploaded_file, max_size_mb).result()
+
+    def close(self):
+        """Shut down the extraction worker pool, if one was started"""
+        with self._pool_lock:
+            if self._background_executor is not None:
+                self._background_executor.shutdown()
+                self._background_executor = None
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+    def _get_background_executor(self):
+        """Lazily start the threads that finish LazyDocument extraction in the background"""
+        with self._pool_lock:
+            if self._background_executor is None:
+                self._background_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="pdf-complete")
+            return self._background_executor
+
+    def _get_pool(self):
+        """Lazily start the shared extraction process pool"""
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._pool
+
+    def _extract_ranges_in_pool(self, uploaded_file, ranges) -> List[PageText]:
+        """Extract 0-based [start, stop) page ranges in the worker pool.
+
+        The bytes are spilled to one temporary file that every worker opens, instead
+        of pickling a copy of the PDF into each task.
+        """
+        buffer = _file_buffer(uploaded_file)
+        try:
+            with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as spill:
+                spill.write(buffer)
+        finally:
+            buffer.release()
+
+        try:
+            pool = self._get_pool()
+            futures = [pool.submit(_extract_page_range, spill.name, start, stop) for start, stop in ranges]
+            pages = []
+            for future in futures:
+                pages.extend(future.result())
+            return pages
+        finally:
+            os.remove(spill.name)
+
+    def _decode_txt(self, buffer):
+        """Decode TXT bytes straight from the buffer"""
         try:
-            # Read the text file
-            text = uploaded_file.read().decode('utf-8')
+            text = str(buffer, 'utf-8')
             
             if not text.strip():
                 raise ValueError("The text file appears to be empty")
@@ -53,8 +201,7 @@ class DocumentProcessor:
         except UnicodeDecodeError:
             # Try with different encoding
             try:
-                uploaded_file.seek(0)
-                text = uploaded_file.read().decode('latin-1')
+                text = str(buffer, 'latin-1')
                 return text.strip()
             except Exception as e:
                 raise ValueError(f"Error reading text file: {str(e)}")
@@ -64,21 +211,165 @@ class DocumentProcessor:
     
     def validate_file_size(self, uploaded_file, max_size_mb=10):
         """Validate file size (optional utility method)"""
-        file_size = len(uploaded_file.getvalue())
+        if hasattr(uploaded_file, 'getbuffer'):
+            with uploaded_file.getbuffer() as buffer:
+                file_size = buffer.nbytes
+        else:
+            file_size = uploaded_file.seek(0, io.SEEK_END)
+            uploaded_file.seek(0)
+        self._check_size(file_size, max_size_mb)
+        return True
+
+    def _check_size(self, file_size, max_size_mb):
         max_size_bytes = max_size_mb * 1024 * 1024
         
         if file_size > max_size_bytes:
             raise ValueError(f"File size ({file_size / 1024 / 1024:.1f} MB) exceeds maximum allowed size ({max_size_mb} MB)")
-        
-        return True
     
     def get_document_stats(self, text):
         """Get basic statistics about the document"""
-        words = text.split()
-        paragraphs = text.split('\n\n')
-        
-        return {
-            'character_count': len(text),
-            'word_count': len(words),
-            'paragraph_count': len([p for p in paragraphs if p.strip()])
-        }
+        return text_stats(text)
+
+
+class LazyDocument:
+    """An uploaded document whose pages are extracted on first access and cached.
+
+    Reading the first pages of a huge PDF costs only those pages. The remaining
+    pages can be extracted in the background (in the processor's worker pool for
+    large documents) while the first ones are already in use. All methods are
+    safe to call from several threads.
+    """
+
+    def __init__(self, processor: DocumentProcessor, uploaded_file, source_hash, size_bytes, pages=None):
+        self.filename = uploaded_file.name
+        self.source_hash = source_hash
+        self.size_bytes = size_bytes
+        self._processor = processor
+        self._file = uploaded_file
+        self._lock = threading.RLock()
+        self._background = None
+        self._parse_seconds = 0.0
+        self._cached = False  # Whether this extraction has been written to the cache
+
+        if pages is not None:
+            # Plain text is decoded up front as a single page; cached PDFs arrive fully extracted
+            self._reader = None
+            self._pages = {page.page_number: page for page in pages}
+            self.page_count = len(pages)
+        else:
+            try:
+                uploaded_file.seek(0)
+                self._reader = PyPDF2.PdfReader(uploaded_file)
+                self.page_count = len(self._reader.pages)
+            except Exception as e:
+                raise ValueError(f"Error extracting text from PDF: {str(e)}")
+            self._pages = {}
+
+    @property
+    def extracted_count(self):
+        with self._lock:
+            return len(self._pages)
+
+    @property
+    def is_complete(self):
+        return self.extracted_count == self.page_count
+
+    def page(self, page_number) -> PageText:
+        """Return one page (1-based), extracting it on first access"""
+        if not 1 <= page_number <= self.page_count:
+            raise IndexError(f"Page {page_number} out of range 1-{self.page_count}")
+        with self._lock:
+            page = self._pages.get(page_number)
+            if page is None:
+                started = time.perf_counter()
+                try:
+                    text = self._reader.pages[page_number - 1].extract_text() or ""
+                except Exception as e:
+                    get_metrics().increment("extraction_errors_total", error=type(e).__name__)
+                    raise ValueError(f"Error extracting text from PDF: {str(e)}")
+                page = self._pages[page_number] = PageText(page_number, text)
+                elapsed = time.perf_counter() - started
+                self._parse_seconds += elapsed
+                # Histogram only: one event per page would flood the sinks for large files
+                get_metrics().observe("extraction_page_seconds", elapsed)
+            return page
+
+    def iter_pages(self, first=1, last=None) -> Iterator[PageText]:
+        """Yield pages ``first`` to ``last`` inclusive, extracting each when it is reached"""
+        last = min(last or self.page_count, self.page_count)
+        for page_number in range(max(first, 1), last + 1):
+            yield self.page(page_number)
+
+    def text(self, first=1, last=None) -> str:
+        """Joined text of a page range"""
+        text, _ = join_pages(list(self.iter_pages(first, last)))
+        return text
+
+    def complete_in_background(self) -> Future:
+        """Start extracting every page not yet cached; returns a future for the work"""
+        with self._lock:
+            if self._background is None:
+                self._background = self._processor._get_background_executor().submit(self.complete)
+            return self._background
+
+    def complete(self):
+        """Extract every page not yet cached, fanning large remainders out to the worker pool"""
+        with self._lock:
+            missing = [n for n in range(1, self.page_count + 1) if n not in self._pages]
+        if not missing:
+            return
+        processor = self._processor
+        if processor.max_workers <= 1 or len(missing) < processor.parallel_min_pages:
+            with get_metrics().time_stage("parse_serial", pages=len(missing)):
+                for page_number in missing:
+                    self.page(page_number)
+            return
+
+        # Split the missing pages into contiguous runs, then into roughly one range per worker
+        range_size = -(-len(missing) // processor.max_workers)
+        ranges = []
+        run_start = previous = missing[0]
+        for page_number in missing[1:] + [None]:
+            if page_number != previous + 1 or previous - run_start + 1 >= range_size:
+                ranges.append((run_start - 1, previous))
+                run_start = page_number
+            previous = page_number
+        started = time.perf_counter()
+        pages = processor._extract_ranges_in_pool(self._file, ranges)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            for page in pages:
+                self._pages.setdefault(page.page_number, page)
+            self._parse_seconds += elapsed
+        get_metrics().record_stage("parse_pool", elapsed, pages=len(pages), ranges=len(ranges))
+
+    def result(self) -> IngestResult:
+        """Extract whatever is left and return the full IngestResult"""
+        with self._lock:
+            background = self._background
+        if background is not None:
+            background.result()
+        self.complete()
+
+        pages = [self._pages[n] for n in range(1, self.page_count + 1)]
+        if self._reader is not None:
+            if not any(page.text.strip() for page in pages):
+                raise ValueError("Error extracting text from PDF: No text could be extracted from the PDF")
+            with self._lock:
+                store = not self._cached
+                self._cached = True
+            if store:
+                self._processor.cache.set(self.source_hash, [page.text for page in pages], self._parse_seconds)
+
+        with get_metrics().time_stage("assemble", pages=len(pages)):
+            text, page_offsets = join_pages(pages)
+            return IngestResult(
+                filename=self.filename,
+                size_bytes=self.size_bytes,
+                source_hash=self.source_hash,
+                content_hash=hashlib.md5(text.encode()).hexdigest(),
+                text=text,
+                pages=pages,
+                page_offsets=page_offsets if len(pages) > 1 else None,
+                stats=text_stats(text),
+            )
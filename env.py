@@ -0,0 +1,15 @@
+import threading
+
+_loaded = False
+_lock = threading.Lock()
+
+def load_env():
+    """Load variables from a .env file into the environment, once per process"""
+    global _loaded
+    if _loaded:
+        return
+    with _lock:
+        if not _loaded:
+            from dotenv import load_dotenv
+            load_dotenv()
+            _loaded = True
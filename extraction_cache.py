@@ -0,0 +1,37 @@
+import json
+import zlib
+from typing import List, Optional
+
+from sqlite_cache import TwoTierCache
+
+
+class ExtractionCache(TwoTierCache):
+    """Two-tier (in-memory LRU + SQLite) cache of extracted page texts, keyed by raw file hash.
+
+    Entries are tagged with the extractor version that produced them; rows written
+    by another version are dropped when the cache is opened and never returned.
+    Pages are stored as zlib-compressed JSON.
+    """
+
+    table = "extraction_cache"
+    legacy_tables = ("extractions",)
+    saved_stat = "parse_seconds_saved"
+    decode_errors = (ValueError, zlib.error)
+
+    def __init__(self, extractor_version, path=None, max_memory_entries=32, max_disk_bytes=500 * 1024 * 1024):
+        self.extractor_version = extractor_version
+        super().__init__(path, max_memory_entries, max_disk_bytes, tag=extractor_version)
+
+    def get(self, source_hash) -> Optional[List[str]]:
+        """Return the cached page texts for a file hash, or None"""
+        return self._lookup(source_hash)
+
+    def set(self, source_hash, pages: List[str], parse_seconds=0.0):
+        """Store the page texts of a file; ``parse_seconds`` is how long extraction took"""
+        self._store(source_hash, pages, parse_seconds)
+
+    def _encode(self, pages):
+        return zlib.compress(json.dumps(pages).encode("utf-8"))
+
+    def _decode(self, stored):
+        return json.loads(zlib.decompress(stored).decode("utf-8"))
@@ -0,0 +1,64 @@
+from typing import List
+
+
+class JsonArrayParser:
+    """Splits a JSON array that arrives in chunks into its top-level elements.
+
+    ``feed`` returns the raw text of every element completed by the new chunk, so
+    each one can be decoded (and rejected) on its own instead of the whole array
+    failing on one bad element. Anything before the opening bracket, such as a
+    Markdown code fence or a wrapping object, is skipped.
+    """
+
+    def __init__(self):
+        self._buffer: List[str] = []
+        self._depth = 0  # 1 while inside the top-level array
+        self._in_string = False
+        self._escaped = False
+        self.finished = False
+
+    def feed(self, text) -> List[str]:
+        """Consume the next chunk; returns the raw text of the elements it completed"""
+        elements = []
+        for char in text:
+            if self.finished:
+                break
+            if self._depth == 0:
+                if char == "[":
+                    self._depth = 1
+                continue
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "[{":
+                self._depth += 1
+            elif char in "]}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._flush(elements)
+                    self.finished = True
+                    continue
+            elif char == "," and self._depth == 1:
+                self._flush(elements)
+                continue
+            self._buffer.append(char)
+        return elements
+
+    def close(self) -> List[str]:
+        """Return the unterminated last element, if the input ended before the array closed"""
+        elements = []
+        self._flush(elements)
+        return elements
+
+    def _flush(self, elements):
+        element = "".join(self._buffer).strip()
+        self._buffer = []
+        if element:
+            elements.append(element)
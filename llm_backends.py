@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Iterator, Optional, Protocol
+
+
+class BackendError(Exception):
+    """A transient failure reported by an LLM backend"""
+
+
+class BackendTimeout(BackendError):
+    """A model call that did not finish within its timeout"""
+
+    def __init__(self, timeout):
+        super().__init__(f"The model did not respond within {timeout:g} seconds")
+        self.timeout = timeout
+
+
+class LLMBackend(Protocol):
+    """Interface every model backend used by AIAssistant implements.
+
+    ``timeout`` (seconds, None for no limit) bounds the whole request, including a
+    stream; the call itself must give up and raise once it passes, so no thread is
+    left blocked on an abandoned request.
+    """
+
+    model_name: str
+
+    def generate(self, prompt: str, timeout: Optional[float] = None) -> str:
+        """Return the full text response for a prompt"""
+        ...
+
+    def generate_json(self, prompt: str, timeout: Optional[float] = None) -> str:
+        """Return a response constrained to JSON (as text)"""
+        ...
+
+    def stream(self, prompt: str, timeout: Optional[float] = None) -> Iterator[str]:
+        """Yield the text response in chunks as it is produced"""
+        ...
+
+    def stream_json(self, prompt: str, timeout: Optional[float] = None) -> Iterator[str]:
+        """Yield a JSON-constrained response in chunks as it is produced"""
+        ...
+
+
+class GeminiBackend:
+    """Google Gemini backend; the SDK is imported when the backend is created"""
+
+    def __init__(self, model_name="gemini-2.5-flash", api_key=None):
+        self.model_name = model_name
+        import google.generativeai as genai
+        self._genai = genai
+        try:
+            # Configure the generative AI model
+            genai.configure(api_key=api_key or os.getenv("GEMINI_API_KEY"))
+            self.model = genai.GenerativeModel(model_name)
+        except Exception as e:
+            # Handle cases where the API key is not set or invalid
+            raise ValueError("Failed to configure Gemini API. Please check your API key.") from e
+
+    def generate(self, prompt, timeout=None):
+        return self.model.generate_content(prompt, request_options=self._request_options(timeout)).text
+
+    def generate_json(self, prompt, timeout=None):
+        response = self.model.generate_content(
+            prompt, generation_config=self._json_config(), request_options=self._request_options(timeout)
+        )
+        return response.text
+
+    def stream(self, prompt, timeout=None):
+        for chunk in self.model.generate_content(prompt, stream=True, request_options=self._request_options(timeout)):
+            if chunk.text:
+                yield chunk.text
+
+    def stream_json(self, prompt, timeout=None):
+        for chunk in self.model.generate_content(
+            prompt, stream=True, generation_config=self._json_config(), request_options=self._request_options(timeout)
+        ):
+            if chunk.text:
+                yield chunk.text
+
+    def _json_config(self):
+        return self._genai.types.GenerationConfig(response_mime_type="application/json")
+
+    @staticmethod
+    def _request_options(timeout):
+        # The SDK enforces the deadline on the request itself, so the calling thread is released
+        return {"timeout": timeout} if timeout else None
+
+
+class FakeBackend:
+    """Deterministic offline backend for load tests, benchmarks and CI.
+
+    Responses depend only on the prompt. ``latency`` is a fixed delay before the
+    first token, ``tokens_per_second`` throttles output (None means instant) and
+    ``failure_rate`` is the fraction of calls that raise BackendError, drawn from
+    a generator seeded with ``seed`` so failure sequences are repeatable. A call
+    that would run past its ``timeout`` sleeps until then and raises BackendTimeout.
+    """
+
+    def __init__(self, latency=0.0, tokens_per_second=None, failure_rate=0.0, seed=0,
+                 model_name="fake-model"):
+        self.model_name = model_name
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def generate(self, prompt, timeout=None):
+        deadline = self._begin_call(timeout)
+        text = self._text_response(prompt)
+        self._throttle(text, deadline)
+        return text
+
+    def generate_json(self, prompt, timeout=None):
+        deadline = self._begin_call(timeout)
+        text = self._json_response(prompt)
+        self._throttle(text, deadline)
+        return text
+
+    def stream(self, prompt, timeout=None):
+        deadline = self._begin_call(timeout)
+        for word in re.findall(r"\S+\s*", self._text_response(prompt)):
+            self._throttle(word, deadline)
+            yield word
+
+    def stream_json(self, prompt, timeout=None):
+        deadline = self._begin_call(timeout)
+        for word in re.findall(r"\S+\s*", self._json_response(prompt)):
+            self._throttle(word, deadline)
+            yield word
+
+    def _begin_call(self, timeout):
+        """Count the call and wait out the latency; returns the call's deadline (None for no limit)"""
+        deadline = (time.monotonic(), timeout) if timeout else None
+        with self._lock:
+            self.calls += 1
+            fail = self._random.random() < self.failure_rate
+        self._sleep(self.latency, deadline)
+        if fail:
+            raise BackendError("Simulated backend failure")
+        return deadline
+
+    def _throttle(self, text, deadline):
+        if self.tokens_per_second:
+            self._sleep((len(text) / 4) / self.tokens_per_second, deadline)
+
+    @staticmethod
+    def _sleep(seconds, deadline):
+        if deadline is not None:
+            started, timeout = deadline
+            remaining = started + timeout - time.monotonic()
+            if seconds > remaining:
+                time.sleep(max(remaining, 0))
+                raise BackendTimeout(timeout)
+        if seconds:
+            time.sleep(seconds)
+
+    def _text_response(self, prompt):
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+        if "**Feedback:**" in prompt:
+            return f"Partially correct. This is canned feedback ({digest})."
+        if "**Question:**" in prompt:
+            return (
+                f"Answer: This is a canned answer ({digest}).\n"
+                'Justification: "The document supports this answer."'
+            )
+        words = ["The", "document", "discusses", "its", "main", "topic", "in", "detail."]
+        return f"Summary {digest}: " + " ".join(words[i % len(words)] for i in range(150))
+
+    def _json_response(self, prompt):
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+        # Batch grading prompts list their items with an "index" field
+        indexes = sorted({int(i) for i in re.findall(r'"index":\s*(\d+)', prompt)})
+        if "**Answers to grade:**" in prompt:
+            return json.dumps([
+                {"index": i, "verdict": "partially correct", "feedback": f"Canned feedback {i} ({digest})."}
+                for i in indexes
+            ])
+        return json.dumps([
+            {"question": f"Canned question {i + 1} ({digest})?", "answer": f"Canned answer {i + 1}."}
+            for i in range(3)
+        ])
+
+
+def create_backend(name=None) -> LLMBackend:
+    """Create the backend named by ``name`` or the LLM_BACKEND environment variable"""
+    name = (name or os.getenv("LLM_BACKEND", "gemini")).lower()
+    if name == "gemini":
+        return GeminiBackend(os.getenv("GEMINI_MODEL", "gemini-2.5-flash"))
+    if name == "fake":
+        return FakeBackend(
+            latency=float(os.getenv("FAKE_LLM_LATENCY", 0.0)),
+            tokens_per_second=float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", 0)) or None,
+            failure_rate=float(os.getenv("FAKE_LLM_FAILURE_RATE", 0.0)),
+        )
+    raise ValueError(f"Unknown LLM backend: {name}")
@@ -0,0 +1,41 @@
+import hashlib
+import json
+from typing import Optional
+
+from sqlite_cache import TwoTierCache
+
+
+def make_cache_key(model_name, prompt, generation_config=None):
+    """Build a cache key from the model name, normalized prompt and generation config"""
+    # Collapse whitespace so indentation changes in prompt templates don't miss the cache
+    normalized_prompt = " ".join(prompt.split())
+    prompt_hash = hashlib.sha256(normalized_prompt.encode("utf-8")).hexdigest()
+    config = json.dumps(generation_config or {}, sort_keys=True, default=str)
+    return hashlib.sha256(f"{model_name}\0{prompt_hash}\0{config}".encode("utf-8")).hexdigest()
+
+
+class ResponseCache(TwoTierCache):
+    """Two-tier (in-memory LRU + SQLite) cache for model responses; entries expire after ``ttl_seconds``"""
+
+    table = "response_cache"
+    legacy_tables = ("responses",)
+    saved_stat = "latency_saved_seconds"
+
+    def __init__(self, path=None, max_memory_entries=256, max_disk_bytes=100 * 1024 * 1024,
+                 ttl_seconds=7 * 24 * 3600):
+        self.ttl_seconds = ttl_seconds
+        super().__init__(path, max_memory_entries, max_disk_bytes)
+
+    def get(self, key) -> Optional[str]:
+        """Return the cached response for a key, or None"""
+        return self._lookup(key)
+
+    def set(self, key, value, latency=0.0):
+        """Store a response in both tiers; ``latency`` is how long the model call took"""
+        self._store(key, value, latency)
+
+    def _is_fresh(self, created_at, now):
+        return now - created_at <= self.ttl_seconds
+
+    def _expiry_cutoff(self, now):
+        return now - self.ttl_seconds
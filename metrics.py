@@ -0,0 +1,306 @@
+"""Lightweight instrumentation for model calls and document extraction.
+
+Every recorded event updates in-process aggregates (counters and latency
+histograms) and is passed to the configured sinks. Set METRICS_SINK to
+``jsonl:<path>`` to append one JSON object per event, or ``prometheus:<path>``
+to keep a Prometheus text-format snapshot up to date (e.g. for node_exporter's
+textfile collector). PROFILE_UPLOADS=cprofile,tracemalloc turns on profiling of
+the upload path.
+"""
+import cProfile
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Protocol, Tuple
+
+# Upper bounds in seconds; model calls take seconds, single-page extraction milliseconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def estimate_tokens_from_chars(chars):
+    """Same four-characters-per-token heuristic as retrieval.estimate_tokens"""
+    return chars // 4 + 1 if chars else 0
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        running = 0
+        rows = []
+        for bound, count in zip(list(self.buckets) + ["+Inf"], self.counts):
+            running += count
+            rows.append((str(bound), running))
+        return rows
+
+
+class MetricsSink(Protocol):
+    """Receives every recorded event"""
+
+    def emit(self, event: Dict) -> None:
+        ...
+
+
+class JsonLinesSink:
+    """Appends each event as one JSON line"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def emit(self, event):
+        line = json.dumps(event, default=str) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+class PrometheusFileSink:
+    """Rewrites a Prometheus text-format snapshot of the registry at most every ``min_interval`` seconds"""
+
+    def __init__(self, path, registry: "MetricsRegistry", min_interval=5.0):
+        self.path = path
+        self.registry = registry
+        self.min_interval = min_interval
+        self._written_at = 0.0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def emit(self, event):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._written_at < self.min_interval:
+                return
+            self._written_at = now
+        self.write()
+
+    def write(self):
+        # Write then rename so scrapers never read a half-written file
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.registry.render_prometheus())
+        os.replace(tmp_path, self.path)
+
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms keyed by metric name and labels"""
+
+    def __init__(self, sinks: Optional[List[MetricsSink]] = None):
+        self.sinks: List[MetricsSink] = list(sinks or [])
+        self._counters: Dict[Tuple, float] = {}
+        self._histograms: Dict[Tuple, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def add_sink(self, sink: MetricsSink):
+        self.sinks.append(sink)
+
+    def increment(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def record_call(self, operation, latency, prompt_chars, response_chars, cache_status,
+                    error=None, attempts=1, first_chunk_latency=None):
+        """Record one AIAssistant model call (or cache hit)"""
+        status = "error" if error else "ok"
+        self.observe("llm_call_seconds", latency, operation=operation, cache=cache_status)
+        self.increment("llm_calls_total", operation=operation, cache=cache_status, status=status)
+        self.increment("llm_prompt_chars_total", prompt_chars, operation=operation)
+        self.increment("llm_response_chars_total", response_chars, operation=operation)
+        self.increment("llm_prompt_tokens_estimated_total", estimate_tokens_from_chars(prompt_chars), operation=operation)
+        self.increment("llm_response_tokens_estimated_total", estimate_tokens_from_chars(response_chars),
+                       operation=operation)
+        if attempts > 1:
+            self.increment("llm_retries_total", attempts - 1, operation=operation)
+        if error:
+            self.increment("llm_errors_total", operation=operation, error=error)
+        if first_chunk_latency is not None:
+            self.observe("llm_first_chunk_seconds", first_chunk_latency, operation=operation)
+
+        self._emit({
+            "type": "llm_call",
+            "operation": operation,
+            "latency": latency,
+            "first_chunk_latency": first_chunk_latency,
+            "prompt_chars": prompt_chars,
+            "response_chars": response_chars,
+            "prompt_tokens": estimate_tokens_from_chars(prompt_chars),
+            "response_tokens": estimate_tokens_from_chars(response_chars),
+            "cache": cache_status,
+            "attempts": attempts,
+            "error": error,
+        })
+
+    def record_stage(self, stage, seconds, **labels):
+        """Record the duration of one extraction stage (hashing, page parsing, joining...)"""
+        self.observe("extraction_stage_seconds", seconds, stage=stage)
+        self._emit(dict(labels, type="extraction_stage", stage=stage, seconds=seconds))
+
+    @contextmanager
+    def time_stage(self, stage, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(stage, time.perf_counter() - started, **labels)
+
+    def snapshot(self) -> Dict:
+        """Current aggregates as plain data"""
+        with self._lock:
+            return {
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self._counters.items())
+                ],
+                "histograms": [
+                    {"name": name, "labels": dict(labels), "count": h.count, "sum": h.sum,
+                     "buckets": dict(h.cumulative())}
+                    for (name, labels), h in sorted(self._histograms.items(), key=lambda item: item[0])
+                ],
+            }
+
+    def render_prometheus(self) -> str:
+        """Aggregates in the Prometheus text exposition format"""
+        def format_labels(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{key}="{_escape_label(value)}"' for key, value in pairs) + "}"
+
+        lines = []
+        with self._lock:
+            typed = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} counter")
+                    typed.add(name)
+                lines.append(f"{name}{format_labels(labels)} {value}")
+            for (name, labels), histogram in sorted(self._histograms.items(), key=lambda item: item[0]):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} histogram")
+                    typed.add(name)
+                for bound, count in histogram.cumulative():
+                    lines.append(f"{name}_bucket{format_labels(labels, [('le', bound)])} {count}")
+                lines.append(f"{name}_sum{format_labels(labels)} {histogram.sum}")
+                lines.append(f"{name}_count{format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def _emit(self, event):
+        event["timestamp"] = time.time()
+        for sink in self.sinks:
+            try:
+                sink.emit(event)
+            except Exception as e:
+                # Instrumentation must never break the operation being measured
+                logging.error(f"Error writing metrics to {type(sink).__name__}: {e}")
+
+
+def create_sink(spec, registry: MetricsRegistry) -> Optional[MetricsSink]:
+    """Build a sink from a ``kind:path`` spec such as ``jsonl:.cache/metrics.jsonl``"""
+    if not spec:
+        return None
+    kind, _, path = spec.partition(":")
+    kind = kind.lower()
+    if kind == "jsonl":
+        return JsonLinesSink(path or os.path.join(".cache", "metrics.jsonl"))
+    if kind == "prometheus":
+        return PrometheusFileSink(path or os.path.join(".cache", "metrics.prom"), registry)
+    raise ValueError(f"Unknown metrics sink: {kind}")
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> MetricsRegistry:
+    """The process-wide registry, with sinks from METRICS_SINK (comma-separated) attached on first use"""
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                registry = MetricsRegistry()
+                for spec in filter(None, os.getenv("METRICS_SINK", "").split(",")):
+                    registry.add_sink(create_sink(spec.strip(), registry))
+                _metrics = registry
+    return _metrics
+
+
+@contextmanager
+def profile_section(name, modes=None, output_dir=None):
+    """Opt-in cProfile and/or tracemalloc around a block of code.
+
+    ``modes`` defaults to the PROFILE_UPLOADS environment variable (e.g.
+    ``cprofile,tracemalloc``); with no modes the block runs unprofiled. cProfile
+    stats are written to ``<output_dir>/<name>-<timestamp>.prof`` and the top
+    allocation sites are logged.
+    """
+    if modes is None:
+        modes = os.getenv("PROFILE_UPLOADS", "")
+    modes = {mode.strip().lower() for mode in modes.split(",") if mode.strip()}
+    if not modes:
+        yield
+        return
+
+    output_dir = output_dir or os.getenv("PROFILE_DIR", os.path.join(".cache", "profiles"))
+    profiler = cProfile.Profile() if "cprofile" in modes else None
+    # tracemalloc is process-wide; leave it alone if something else already started it
+    trace_memory = "tracemalloc" in modes and not tracemalloc.is_tracing()
+
+    if trace_memory:
+        tracemalloc.start()
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+            os.makedirs(output_dir, exist_ok=True)
+            path = os.path.join(output_dir, f"{name}-{int(time.time())}.prof")
+            profiler.dump_stats(path)
+            top = pstats.Stats(profiler).sort_stats("cumulative")
+            logging.info(f"Profile of {name} written to {path} ({top.total_tt:.3f}s total)")
+        if trace_memory:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            top_stats = snapshot.statistics("lineno")[:10]
+            logging.info(
+                f"Peak traced memory during {name}: {peak / 1024 / 1024:.1f} MB; top allocations:\n"
+                + "\n".join(str(stat) for stat in top_stats)
+            )
@@ -0,0 +1,128 @@
+import logging
+import threading
+import weakref
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+
+def _cancel_all(futures: Dict[Tuple[str, str], Future]):
+    for future in list(futures.values()):
+        future.cancel()
+    futures.clear()
+
+
+class StreamingFuture(Future):
+    """Future for a list produced item by item; ``items`` can be read while it is still growing.
+
+    Unlike a plain Future, cancelling also stops a producer that is already running.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.items: List = []
+        self._stop = threading.Event()
+        self._changed = threading.Condition()
+
+    def cancel(self):
+        self._stop.set()
+        return super().cancel()
+
+    def wait_for(self, count, timeout=None) -> bool:
+        """Block until there are at least ``count`` items or the producer has finished; True if there are"""
+        with self._changed:
+            self._changed.wait_for(lambda: len(self.items) >= count or self.done(), timeout)
+            return len(self.items) >= count
+
+
+def stream_in_background(executor, produce: Callable[[], Iterator]) -> StreamingFuture:
+    """Consume the iterator returned by ``produce()`` on ``executor``, collecting items into a StreamingFuture"""
+    future = StreamingFuture()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        iterator = None
+        try:
+            iterator = produce()
+            for item in iterator:
+                if future._stop.is_set():
+                    break
+                with future._changed:
+                    future.items.append(item)
+                    future._changed.notify_all()
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(future.items)
+        finally:
+            if iterator is not None and hasattr(iterator, "close"):
+                iterator.close()
+            with future._changed:
+                future._changed.notify_all()
+
+    executor.submit(run)
+    return future
+
+
+class ChatTasks:
+    """Background work started for the chats of one session, keyed by chat id and task name.
+
+    A task is started at most once: asking for a task that is in flight or already
+    finished returns the same future, so a caller attaches to work started earlier
+    (e.g. the quiz kicked off at upload) instead of repeating it. Failed or cancelled
+    tasks are started again on the next request. Everything still pending is
+    cancelled when a chat is abandoned or the session goes away.
+    """
+
+    def __init__(self):
+        self._futures: Dict[Tuple[str, str], Future] = {}
+        self._lock = threading.Lock()
+        # Streamlit gives no hook for session end; cancel leftovers when the session state is collected
+        weakref.finalize(self, _cancel_all, self._futures)
+
+    def submit(self, chat_id, name, start: Callable[[], Future]) -> Future:
+        """Return the chat's usable future for ``name``, calling ``start()`` to create one if needed"""
+        key = (chat_id, name)
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None and not future.cancelled() and not (future.done() and future.exception()):
+                return future
+            future = start()
+            self._futures[key] = future
+            return future
+
+    def get(self, chat_id, name) -> Optional[Future]:
+        with self._lock:
+            return self._futures.get((chat_id, name))
+
+    def pop(self, chat_id, name) -> Optional[Future]:
+        """Remove and return a task, so its result is only held by the caller from now on"""
+        with self._lock:
+            return self._futures.pop((chat_id, name), None)
+
+    def cancel_chat(self, chat_id) -> List[str]:
+        """Cancel and forget every task of a chat; returns the names of tasks that were still pending"""
+        cancelled = []
+        with self._lock:
+            for key in [key for key in self._futures if key[0] == chat_id]:
+                future = self._futures.pop(key)
+                if not future.done():
+                    future.cancel()
+                    cancelled.append(key[1])
+        if cancelled:
+            logging.info(f"Cancelled background work for {chat_id}: {', '.join(cancelled)}")
+        return cancelled
+
+    def status(self, chat_id) -> Dict[str, str]:
+        """Task name -> pending, done, failed or cancelled"""
+        with self._lock:
+            items = [(name, future) for (owner, name), future in self._futures.items() if owner == chat_id]
+        statuses = {}
+        for name, future in items:
+            if future.cancelled():
+                statuses[name] = "cancelled"
+            elif not future.done():
+                statuses[name] = "pending"
+            else:
+                statuses[name] = "failed" if future.exception() else "done"
+        return statuses
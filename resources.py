@@ -0,0 +1,141 @@
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict
+
+
+class ResourceRegistry:
+    """Builds shared, process-wide objects once on first use and hands out the same instance.
+
+    Thread-safety: ``get`` may be called from any number of Streamlit script threads.
+    Each resource is built at most once, under a per-resource lock, so a slow build
+    only blocks callers of that resource. A factory that raises is not cached; the
+    next ``get`` retries. The registered objects themselves must be safe to share
+    between threads (see ``get_document_processor`` and ``get_ai_assistant``).
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable] = {}
+        self._instances = {}
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict] = {}
+
+    def register(self, name, factory: Callable):
+        """Register a zero-argument factory for a resource"""
+        with self._lock:
+            self._factories[name] = factory
+            self._build_locks.setdefault(name, threading.Lock())
+            self._stats.setdefault(name, {"builds": 0, "reuses": 0, "build_seconds": 0.0})
+
+    def get(self, name):
+        """Return the shared instance, building it on first use"""
+        instance = self._instances.get(name)
+        if instance is not None:
+            self._record_reuse(name)
+            return instance
+
+        try:
+            build_lock = self._build_locks[name]
+        except KeyError:
+            raise KeyError(f"Unknown resource: {name}") from None
+
+        with build_lock:
+            # Another thread may have finished building while we waited
+            instance = self._instances.get(name)
+            if instance is not None:
+                self._record_reuse(name)
+                return instance
+
+            started = time.perf_counter()
+            instance = self._factories[name]()
+            elapsed = time.perf_counter() - started
+
+            with self._lock:
+                self._instances[name] = instance
+                self._stats[name]["builds"] += 1
+                self._stats[name]["build_seconds"] = elapsed
+            logging.info(f"Initialized shared resource {name} in {elapsed:.3f}s")
+            return instance
+
+    def reset(self, name=None):
+        """Forget built instances so the next get rebuilds them"""
+        with self._lock:
+            names = [name] if name else list(self._instances)
+            for key in names:
+                self._instances.pop(key, None)
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """Per resource build count, build time, reuse count and the build time reuse avoided"""
+        with self._lock:
+            return {
+                name: dict(stats, saved_seconds=stats["build_seconds"] * stats["reuses"])
+                for name, stats in self._stats.items()
+            }
+
+    def _record_reuse(self, name):
+        with self._lock:
+            self._stats[name]["reuses"] += 1
+
+
+def _build_document_processor():
+    from document_processor import DocumentProcessor
+    return DocumentProcessor()
+
+
+def _build_ai_assistant():
+    from ai_assistant import AIAssistant
+    return AIAssistant()
+
+
+def _build_content_store():
+    from content_store import ContentStore
+    return ContentStore(max_memory_bytes=int(os.getenv("CONTENT_STORE_MEMORY_BYTES", 256 * 1024 * 1024)))
+
+
+def _build_background_executor():
+    from concurrent.futures import ThreadPoolExecutor
+    return ThreadPoolExecutor(max_workers=int(os.getenv("PRECOMPUTE_WORKERS", 4)), thread_name_prefix="precompute")
+
+
+def _build_quiz_executor():
+    from concurrent.futures import ThreadPoolExecutor
+    return ThreadPoolExecutor(max_workers=int(os.getenv("QUIZ_STREAM_WORKERS", 8)), thread_name_prefix="quiz-stream")
+
+
+registry = ResourceRegistry()
+registry.register("document_processor", _build_document_processor)
+registry.register("ai_assistant", _build_ai_assistant)
+registry.register("content_store", _build_content_store)
+registry.register("background_executor", _build_background_executor)
+registry.register("quiz_executor", _build_quiz_executor)
+
+
+def get_document_processor():
+    """Shared DocumentProcessor; its worker pool is created under a lock and is safe to share"""
+    return registry.get("document_processor")
+
+
+def get_ai_assistant():
+    """Shared AIAssistant; the model client and the response cache are safe to use from many threads"""
+    return registry.get("ai_assistant")
+
+
+def get_content_store():
+    """Shared ContentStore holding document texts for every session; access is guarded by its own lock"""
+    return registry.get("content_store")
+
+
+def get_background_executor():
+    """Shared thread pool for CPU-side precomputation (chunk indexes) started after uploads"""
+    return registry.get("background_executor")
+
+
+def get_quiz_executor():
+    """Shared thread pool that consumes background quiz streams.
+
+    Each stream blocks a thread for as long as its model calls take, so it is kept
+    apart from the precompute pool and never delays chunk index builds.
+    """
+    return registry.get("quiz_executor")
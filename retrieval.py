@@ -0,0 +1,160 @@
+import math
+import re
+import sys
+from bisect import bisect_right
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def estimate_tokens(text):
+    """Rough token estimate (~4 characters per token)"""
+    return len(text) // 4 + 1
+
+
+def tokenize(text):
+    """Lower-case word tokens used for indexing and querying"""
+    return _TOKEN_RE.findall(text.lower())
+
+
+@dataclass
+class DocumentChunk:
+    """A slice of the document with its position in the original text"""
+    index: int
+    text: str
+    start: int
+    end: int
+    page: Optional[int] = None
+
+
+@dataclass
+class ChunkSpan:
+    """Where a chunk lies in the document, without its text"""
+    index: int
+    start: int
+    end: int
+    page: Optional[int] = None
+
+    def tokens(self):
+        """Same four-characters-per-token estimate as estimate_tokens, from the span length"""
+        return (self.end - self.start) // 4 + 1
+
+
+def split_into_chunks(text, chunk_chars=2000, overlap_chars=200, page_offsets=None) -> List[DocumentChunk]:
+    """Split text into overlapping chunks, breaking on whitespace where possible.
+
+    ``page_offsets`` is an optional sorted list of the character offsets at which
+    each page starts; when given, every chunk records the (1-based) page it starts on.
+    """
+    if overlap_chars >= chunk_chars:
+        raise ValueError("overlap_chars must be smaller than chunk_chars")
+
+    chunks = []
+    length = len(text)
+    start = 0
+    while start < length:
+        end = min(start + chunk_chars, length)
+        if end < length:
+            # Prefer to end the chunk on a whitespace boundary
+            boundary = max(text.rfind(" ", start + chunk_chars // 2, end),
+                           text.rfind("\n", start + chunk_chars // 2, end))
+            if boundary != -1:
+                end = boundary
+
+        page = bisect_right(page_offsets, start) if page_offsets else None
+        chunks.append(DocumentChunk(len(chunks), text[start:end], start, end, page))
+
+        if end >= length:
+            break
+        start = max(end - overlap_chars, start + 1)
+
+    return chunks
+
+
+class ChunkIndex:
+    """BM25 inverted index over the chunks of a single document.
+
+    Only postings and chunk offsets are held; chunk text is sliced on demand from
+    the document text returned by ``text_source()`` (e.g. a ContentStore lookup by
+    handle), so an index kept per chat does not duplicate its document.
+    """
+
+    def __init__(self, chunks: List[DocumentChunk], text_source: Callable[[], Optional[str]], k1=1.5, b=0.75):
+        self.chunks = [ChunkSpan(chunk.index, chunk.start, chunk.end, chunk.page) for chunk in chunks]
+        self.text_source = text_source
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.chunk_lengths = []
+
+        for chunk in chunks:
+            terms = Counter(tokenize(chunk.text))
+            self.chunk_lengths.append(sum(terms.values()))
+            for term, freq in terms.items():
+                self.postings[term].append((chunk.index, freq))
+
+        self.avg_length = (sum(self.chunk_lengths) / len(chunks)) if chunks else 0.0
+
+    @classmethod
+    def build(cls, text, chunk_chars=2000, overlap_chars=200, page_offsets=None, text_source=None):
+        """Chunk a document and index it; without a ``text_source`` the index keeps ``text`` itself"""
+        return cls(split_into_chunks(text, chunk_chars, overlap_chars, page_offsets), text_source or (lambda: text))
+
+    def memory_bytes(self) -> int:
+        """Approximate bytes held by the chunk offsets and postings, excluding the document text"""
+        return (
+            sum(sys.getsizeof(chunk) for chunk in self.chunks)
+            + sum(sys.getsizeof(term) + sys.getsizeof(postings) for term, postings in self.postings.items())
+            + sys.getsizeof(self.chunk_lengths)
+        )
+
+    def search(self, query, top_k=8) -> List[Tuple[ChunkSpan, float]]:
+        """Return the best matching chunks for a query, highest score first"""
+        scores = defaultdict(float)
+        n_chunks = len(self.chunks)
+
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_chunks - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id, freq in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.chunk_lengths[chunk_id] / self.avg_length)
+                scores[chunk_id] += idf * freq * (self.k1 + 1) / (freq + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [(self.chunks[chunk_id], score) for chunk_id, score in ranked]
+
+    def select_chunks(self, query, top_k=8, token_budget=4000) -> List[ChunkSpan]:
+        """Pick the top-k matching chunks that fit the token budget, in document order"""
+        ranked = [chunk for chunk, _ in self.search(query, top_k)]
+        if not ranked:
+            # Nothing matched lexically; fall back to the start of the document
+            ranked = self.chunks[:top_k]
+
+        selected = []
+        used = 0
+        for chunk in ranked:
+            cost = chunk.tokens()
+            if used + cost > token_budget:
+                continue
+            selected.append(chunk)
+            used += cost
+
+        return sorted(selected, key=lambda chunk: chunk.start)
+
+    def build_context(self, query, top_k=8, token_budget=4000):
+        """Format the selected chunks as prompt context"""
+        chunks = self.select_chunks(query, top_k, token_budget)
+        text = self.text_source() if chunks else None
+        if text is None:
+            return ""
+        parts = []
+        for chunk in chunks:
+            label = f"[Excerpt {chunk.index + 1}"
+            if chunk.page is not None:
+                label += f", page {chunk.page}"
+            parts.append(f"{label}]\n{text[chunk.start:chunk.end].strip()}")
+        return "\n\n".join(parts)
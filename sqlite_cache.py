@@ -0,0 +1,173 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class TwoTierCache:
+    """In-memory LRU in front of a size-capped SQLite table, shared by the response and extraction caches.
+
+    Each entry records ``cost``, the seconds it took to produce, so hits can report
+    the time they saved. Subclasses name the table and the stat for that saving,
+    and may override the value encoding (``_encode``/``_decode``) and freshness
+    (``_is_fresh``/``_expiry_cutoff``). Rows carry a ``tag`` (e.g. a version); rows
+    with another tag are deleted when the cache is opened and never returned.
+    """
+
+    table = "cache"
+    # Tables written by earlier versions of a subclass, dropped when the cache is opened
+    legacy_tables = ()
+    saved_stat = "seconds_saved"
+    # Errors _decode raises for a stored value it can't read; such rows count as misses
+    decode_errors = (ValueError,)
+
+    def __init__(self, path=None, max_memory_entries=256, max_disk_bytes=100 * 1024 * 1024, tag=""):
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.tag = tag
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (value, created_at, cost)
+        self._lock = threading.Lock()
+        self._conn = None
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0,
+                      self.saved_stat: 0.0}
+
+        if path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                self._conn = sqlite3.connect(path, check_same_thread=False)
+                for legacy_table in self.legacy_tables:
+                    self._conn.execute(f"DROP TABLE IF EXISTS {legacy_table}")
+                self._conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                    "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, cost REAL NOT NULL, "
+                    "tag TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+                )
+                self._conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_{self.table}_accessed ON {self.table}(accessed_at)"
+                )
+                self._conn.execute(f"DELETE FROM {self.table} WHERE tag != ?", (tag,))
+                self._conn.commit()
+            except sqlite3.Error as e:
+                # The disk tier is an optimisation; run memory-only if it can't be opened
+                logging.error(f"Error opening {self.table} at {path}: {e}")
+                self._conn = None
+
+    def _encode(self, value) -> Any:
+        """Value as stored in SQLite"""
+        return value
+
+    def _decode(self, stored) -> Any:
+        return stored
+
+    def _is_fresh(self, created_at, now) -> bool:
+        return True
+
+    def _expiry_cutoff(self, now) -> Optional[float]:
+        """Rows created before this time are stale and deleted during eviction; None keeps them"""
+        return None
+
+    def _lookup(self, key):
+        """Return the cached value for a key, or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created_at, cost = entry
+                if self._is_fresh(created_at, now):
+                    self._memory.move_to_end(key)
+                    self._record_hit("memory_hits", cost)
+                    return value
+                del self._memory[key]
+
+            if self._conn is not None:
+                try:
+                    row = self._conn.execute(
+                        f"SELECT value, created_at, cost FROM {self.table} WHERE key = ? AND tag = ?", (key, self.tag)
+                    ).fetchone()
+                    if row is not None:
+                        stored, created_at, cost = row
+                        if self._is_fresh(created_at, now):
+                            value = self._decode(stored)
+                            self._conn.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key))
+                            self._conn.commit()
+                            self._remember(key, value, created_at, cost)
+                            self._record_hit("disk_hits", cost)
+                            return value
+                        self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                        self._conn.commit()
+                except (sqlite3.Error, *self.decode_errors) as e:
+                    logging.error(f"Error reading {self.table}: {e}")
+
+            self.stats["misses"] += 1
+            return None
+
+    def _store(self, key, value, cost=0.0):
+        """Store a value in both tiers; ``cost`` is how long it took to produce"""
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now, cost)
+            self.stats["stores"] += 1
+
+            if self._conn is not None:
+                try:
+                    stored = self._encode(value)
+                    size = len(stored.encode("utf-8")) if isinstance(stored, str) else len(stored)
+                    self._conn.execute(
+                        f"INSERT OR REPLACE INTO {self.table} (key, value, size, cost, tag, created_at, accessed_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (key, stored, size, cost, self.tag, now, now),
+                    )
+                    self._evict_disk(now)
+                    self._conn.commit()
+                except sqlite3.Error as e:
+                    logging.error(f"Error writing {self.table}: {e}")
+
+    def clear(self):
+        """Drop every cached entry"""
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute(f"DELETE FROM {self.table}")
+                self._conn.commit()
+
+    def get_stats(self) -> Dict:
+        """Return hit/miss counters, the hit rate and the time hits have saved"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def _record_hit(self, tier, cost):
+        self.stats[tier] += 1
+        self.stats[self.saved_stat] += cost
+
+    def _remember(self, key, value, created_at, cost):
+        """Insert into the in-memory LRU tier (caller holds the lock)"""
+        self._memory[key] = (value, created_at, cost)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self, now):
+        """Drop stale rows, then least recently used rows over the size cap (caller holds the lock)"""
+        cutoff = self._expiry_cutoff(now)
+        if cutoff is not None:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE created_at < ?", (cutoff,))
+        total = self._conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+
+        rows = self._conn.execute(f"SELECT key, size FROM {self.table} ORDER BY accessed_at").fetchall()
+        for key, size in rows:
+            if total <= self.max_disk_bytes:
+                break
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            total -= size
+            self.stats["evictions"] += 1
@@ -0,0 +1,53 @@
+"""Statement counts for DatabaseManager reads, so N+1 query regressions fail loudly."""
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, DatabaseManager, create_search_index
+
+
+@pytest.fixture
+def manager(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(engine)
+    create_search_index(engine)
+    yield DatabaseManager(sessionmaker(bind=engine, expire_on_commit=False))
+    engine.dispose()
+
+
+def save_quizzes(manager, document_id, count):
+    for i in range(count):
+        manager.save_quiz_session(document_id, f"session-{i}", {
+            "questions": [{}] * 3,
+            "completed": True,
+            "answers": [
+                {"question": f"Q{n}?", "user_answer": "A", "correct_answer": "B", "ai_feedback": "C"}
+                for n in range(3)
+            ],
+        })
+
+
+@pytest.mark.parametrize("session_count", [1, 5])
+def test_get_quiz_history_runs_two_statements(manager, session_count):
+    document_id = manager.save_document("doc.txt", "Revenue grew in the north region.")
+    save_quizzes(manager, document_id, session_count)
+
+    with manager.count_queries() as counter:
+        history = manager.get_quiz_history(document_id, limit=10)
+
+    assert len(history) == session_count
+    assert all(len(quiz["answers"]) == 3 for quiz in history)
+    # One query for the sessions and one IN query for all of their answers
+    assert counter.count == 2, counter.statements
+
+
+def test_get_document_stats_runs_one_statement(manager):
+    document_id = manager.save_document("doc.txt", "Revenue grew in the north region.")
+    save_quizzes(manager, document_id, 2)
+    manager.save_qa_session(document_id, "session", [{"question": "What grew?", "answer": "Revenue."}])
+
+    with manager.count_queries() as counter:
+        stats = manager.get_document_stats()
+
+    assert stats == {"total_documents": 1, "total_qa_sessions": 1, "total_quiz_sessions": 2}
+    assert counter.count == 1, counter.statements
@@ -0,0 +1,195 @@
+import math
+import sys
+import threading
+import zlib
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from retrieval import DocumentChunk, estimate_tokens, split_into_chunks, tokenize
+
+
+class HashingEmbedder:
+    """Offline text embeddings: signed feature hashing of words and word bigrams.
+
+    No model or training is involved, so vectors are reproducible everywhere and
+    only depend on ``dim``. Rows are L2-normalised, making dot products cosine scores.
+    """
+
+    def __init__(self, dim=512):
+        self.dim = dim
+
+    def embed(self, texts: Iterable[str]) -> np.ndarray:
+        texts = list(texts)
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            features = Counter(tokens)
+            features.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+            for feature, count in features.items():
+                hashed = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if hashed & 0x80000000 else -1.0
+                vectors[row, hashed % self.dim] += sign * (1.0 + math.log(count))
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+@dataclass
+class CorpusChunk:
+    """A chunk in the cross-document index: its document and position, not its text"""
+    document_id: str
+    document_name: str
+    index: int
+    start: int
+    end: int
+    page: Optional[int] = None
+
+
+class VectorIndex:
+    """Brute-force cosine top-k search over chunk vectors from many documents.
+
+    Only vectors and chunk offsets are held; chunk text is sliced on demand from
+    the document text returned by ``text_source(document_id)`` (e.g. a ContentStore
+    lookup by handle). Documents are added incrementally: vectors go into a matrix
+    that doubles when full, so adding a document never rebuilds what is already
+    indexed. Safe for concurrent searches while documents are being added or removed.
+    """
+
+    def __init__(self, text_source: Callable[[str], Optional[str]], embedder: HashingEmbedder = None, capacity=0):
+        self.text_source = text_source
+        self.embedder = embedder or HashingEmbedder()
+        self.entries: List[CorpusChunk] = []
+        self._vectors = np.zeros((capacity, self.embedder.dim), dtype=np.float32)
+        self._document_ids = set()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def document_count(self):
+        return len(self._document_ids)
+
+    def contains(self, document_id) -> bool:
+        return document_id in self._document_ids
+
+    def memory_bytes(self) -> int:
+        """Approximate bytes held: the vector matrix (including spare rows) and the chunk entries"""
+        with self._lock:
+            return self._vectors.nbytes + sum(sys.getsizeof(entry) for entry in self.entries)
+
+    def add_document(self, document_id, document_name, text=None, chunks: List[DocumentChunk] = None) -> np.ndarray:
+        """Embed and add a document's chunks (chunking ``text`` if no chunks are given).
+
+        Returns the chunk vectors so callers can persist them. Re-adding a known
+        document is a no-op.
+        """
+        if self.contains(document_id):
+            return np.zeros((0, self.embedder.dim), dtype=np.float32)
+        if chunks is None:
+            chunks = split_into_chunks(text)
+        vectors = self.embedder.embed(chunk.text for chunk in chunks)
+        self.add_vectors(document_id, document_name, chunks, vectors)
+        return vectors
+
+    def add_vectors(self, document_id, document_name, chunks: List[DocumentChunk], vectors: np.ndarray):
+        """Add precomputed chunk vectors, e.g. loaded from the database"""
+        if len(chunks) != len(vectors):
+            raise ValueError("Every chunk needs exactly one vector")
+        with self._lock:
+            if document_id in self._document_ids:
+                return
+            size = len(self.entries)
+            needed = size + len(chunks)
+            if needed > len(self._vectors):
+                grown = np.zeros((max(needed, 2 * len(self._vectors)), self.embedder.dim), dtype=np.float32)
+                grown[:size] = self._vectors[:size]
+                self._vectors = grown
+            self._vectors[size:needed] = vectors
+            self.entries.extend(
+                CorpusChunk(document_id, document_name, chunk.index, chunk.start, chunk.end, chunk.page)
+                for chunk in chunks
+            )
+            self._document_ids.add(document_id)
+
+    def remove_document(self, document_id):
+        """Drop a document's chunks, e.g. once no chat refers to it any more"""
+        with self._lock:
+            if document_id not in self._document_ids:
+                return
+            keep = [i for i, entry in enumerate(self.entries) if entry.document_id != document_id]
+            # A new matrix rather than compacting in place, so searches holding the old one are unaffected
+            vectors = np.zeros((len(keep), self.embedder.dim), dtype=np.float32)
+            vectors[:] = self._vectors[keep]
+            self._vectors = vectors
+            self.entries = [self.entries[i] for i in keep]
+            self._document_ids.discard(document_id)
+
+    def search(self, query, top_k=8, document_ids: Optional[set] = None) -> List[Tuple[CorpusChunk, float]]:
+        """Return the chunks most similar to the query across all documents, best first"""
+        with self._lock:
+            size = len(self.entries)
+            matrix = self._vectors[:size]
+            entries = self.entries[:size]
+        if not size:
+            return []
+
+        scores = matrix @ self.embedder.embed([query])[0]
+        if document_ids is not None:
+            mask = np.array([entry.document_id in document_ids for entry in entries])
+            scores = np.where(mask, scores, -np.inf)
+
+        k = min(top_k, size)
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(entries[i], float(scores[i])) for i in best if np.isfinite(scores[i]) and scores[i] > 0]
+
+    def build_context(self, query, top_k=8, token_budget=4000):
+        """Format the best matching chunks as prompt context, labelled with their source document.
+
+        Has the same signature as ChunkIndex.build_context, so it can be passed to
+        AIAssistant.answer_question as the ``index``.
+        """
+        parts = []
+        used = 0
+        texts = {}
+        for entry, _ in self.search(query, top_k):
+            if entry.document_id not in texts:
+                texts[entry.document_id] = self.text_source(entry.document_id)
+            text = texts[entry.document_id]
+            if text is None:
+                # The document text is gone; its vectors can no longer be turned into context
+                continue
+            chunk_text = text[entry.start:entry.end]
+            cost = estimate_tokens(chunk_text)
+            if used + cost > token_budget:
+                continue
+            used += cost
+            label = f"[{entry.document_name}"
+            if entry.page is not None:
+                label += f", page {entry.page}"
+            parts.append(f"{label}]\n{chunk_text.strip()}")
+        return "\n\n".join(parts)
+
+    @classmethod
+    def from_database(cls, db_manager, embedder: HashingEmbedder = None):
+        """Load every stored document's chunk vectors into a new index that reads chunk text from the database"""
+        def document_text(document_id):
+            document = db_manager.get_document(document_id)
+            return document.content if document is not None else None
+
+        index = cls(document_text, embedder)
+        for document_id, document_name, chunks, vector_bytes in db_manager.iter_chunk_vectors():
+            if not chunks:
+                continue
+            vectors = np.frombuffer(b"".join(vector_bytes), dtype=np.float32).reshape(len(chunks), -1)
+            if vectors.shape[1] != index.embedder.dim:
+                # Stored with a different embedder configuration; re-embed instead
+                index.add_document(document_id, document_name, chunks=chunks)
+                continue
+            index.add_vectors(document_id, document_name, chunks, vectors)
+        return index